@@ -0,0 +1,238 @@
+"""Unión de un álbum o una lista de reproducción en un único MP4 con capítulos.
+
+Las pistas se unen con el demultiplexor concat de FFmpeg copiando el audio sin
+recodificar. Solo las pistas cuyo códec, frecuencia de muestreo o canales no
+coinciden con los del resto se recodifican antes, a una carpeta temporal. Cada
+pista queda marcada como un capítulo del MP4.
+
+    python album_concat.py pista1.mp3 pista2.mp3 pista3.mp3 -o album.mp4
+    python album_concat.py lista.m3u -o album.mp4
+"""
+import os
+import sys
+import json
+import shutil
+import asyncio
+import argparse
+import tempfile
+import collections
+
+import processes
+from conversion_engine import ConversionEngine, ConversionJob
+
+PLAYLIST_EXTENSIONS = ('.m3u', '.m3u8')
+
+# Códec -> (codificador, muxer, extensión) para recodificar las pistas distintas
+ENCODERS = {
+    "aac": ("aac", "mp4", ".m4a"),
+    "alac": ("alac", "mp4", ".m4a"),
+    "mp3": ("libmp3lame", "mp3", ".mp3"),
+    "flac": ("flac", "flac", ".flac"),
+    "opus": ("libopus", "ogg", ".opus"),
+    "vorbis": ("libvorbis", "ogg", ".ogg"),
+}
+
+
+class Track:
+    """Una pista del álbum con los datos de su primer flujo de audio"""
+
+    def __init__(self, path, codec, sample_rate, channels, duration, title=None):
+        self.path = path
+        self.codec = codec
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.duration = duration
+        self.title = title or os.path.splitext(os.path.basename(path))[0]
+
+        # Archivo que entra en la lista concat (la pista o su versión recodificada)
+        self.concat_path = path
+
+    @property
+    def signature(self):
+        # Dos pistas se pueden unir sin recodificar si coincide su firma
+        return (self.codec, self.sample_rate, self.channels)
+
+    def __repr__(self):
+        return f"<Track {os.path.basename(self.path)} {self.codec} {self.duration:.1f}s>"
+
+
+def read_playlist(path):
+    # Rutas de una lista M3U; las relativas son relativas a la propia lista
+    folder = os.path.dirname(os.path.abspath(path))
+    tracks = []
+    with open(path, 'r', encoding='utf-8-sig', errors='replace') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                tracks.append(os.path.normpath(os.path.join(folder, line)))
+    return tracks
+
+
+def expand_inputs(inputs):
+    # Sustituir las listas de reproducción por sus pistas, respetando el orden
+    paths = []
+    for path in inputs:
+        if path.lower().endswith(PLAYLIST_EXTENSIONS):
+            paths.extend(read_playlist(path))
+        else:
+            paths.append(path)
+    return paths
+
+
+async def probe_track(ffprobe, path):
+    process = await asyncio.create_subprocess_exec(
+        ffprobe, '-v', 'error', '-select_streams', 'a:0',
+        '-show_entries', 'stream=codec_name,sample_rate,channels:format=duration:format_tags=title',
+        '-of', 'json', path,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL
+    )
+    stdout, _ = await processes.communicate(process)
+    if process.returncode != 0:
+        raise RuntimeError(f"No se pudo analizar {path}")
+    data = json.loads(stdout or b"{}")
+    streams = [stream for stream in data.get("streams", []) if stream.get("codec_type", "audio") == "audio"]
+    if not streams:
+        raise RuntimeError(f"{path} no tiene audio")
+    stream = streams[0]
+    file_format = data.get("format", {})
+    return Track(path, stream.get("codec_name"), int(stream.get("sample_rate") or 0),
+                 int(stream.get("channels") or 0), float(file_format.get("duration") or 0),
+                 (file_format.get("tags") or {}).get("title"))
+
+
+def reference_signature(tracks):
+    # La firma que cubre más duración es la que menos audio obliga a recodificar
+    totals = collections.Counter()
+    for track in tracks:
+        if track.codec in ENCODERS:
+            totals[track.signature] += track.duration
+    if not totals:
+        return ("aac", tracks[0].sample_rate, tracks[0].channels)
+    return totals.most_common(1)[0][0]
+
+
+async def transcode_track(ffmpeg, track, signature, path):
+    codec, sample_rate, channels = signature
+    encoder, muxer, _ = ENCODERS[codec]
+    process = await asyncio.create_subprocess_exec(
+        ffmpeg, '-y', '-v', 'error', '-i', track.path, '-map', '0:a:0',
+        '-c:a', encoder, '-ar', str(sample_rate), '-ac', str(channels), '-f', muxer, path,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+    _, stderr = await processes.communicate(process)
+    if process.returncode != 0:
+        raise RuntimeError(f"Error al recodificar {track.path}: {stderr.decode(errors='replace').strip()}")
+    track.concat_path = path
+
+
+def _concat_quote(path):
+    # Sintaxis de la lista concat: comillas simples, escapando las propias comillas
+    return "'" + os.path.abspath(path).replace("'", "'\\''") + "'"
+
+
+def _metadata_escape(text):
+    for char in ('\\', '=', ';', '#', '\n'):
+        text = text.replace(char, '\\' + char)
+    return text
+
+
+def write_concat_list(tracks, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        for track in tracks:
+            f.write(f"file {_concat_quote(track.concat_path)}\n")
+
+
+def write_chapters(tracks, path, album_title=None):
+    # Un capítulo por pista en formato FFMETADATA (milisegundos)
+    lines = [";FFMETADATA1"]
+    if album_title:
+        lines.append(f"title={_metadata_escape(album_title)}")
+    start = 0
+    for track in tracks:
+        end = start + int(round(track.duration * 1000))
+        lines.extend(["[CHAPTER]", "TIMEBASE=1/1000", f"START={start}", f"END={end}",
+                      f"title={_metadata_escape(track.title)}"])
+        start = end
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+
+
+async def prepare_album(engine, inputs, output_file, work_dir, album_title=None, on_log=None, **job_options):
+    """Analiza y ajusta las pistas y devuelve el ConversionJob que las une"""
+    log = on_log or (lambda message: None)
+    tracks = await asyncio.gather(*(probe_track(engine.ffprobe, path) for path in inputs))
+    signature = reference_signature(tracks)
+    log(f"Formato común: {signature[0]}, {signature[1]} Hz, {signature[2]} canales")
+
+    # Recodificar solo las pistas distintas, con el mismo límite que el motor
+    limit = asyncio.Semaphore(engine.max_concurrent)
+
+    async def adjust(index, track):
+        async with limit:
+            log(f"Recodificando {os.path.basename(track.path)} ({track.codec}, "
+                f"{track.sample_rate} Hz, {track.channels} canales)")
+            path = os.path.join(work_dir, f"{index:04d}{ENCODERS[signature[0]][2]}")
+            await transcode_track(engine.ffmpeg, track, signature, path)
+
+    mismatched = [(index, track) for index, track in enumerate(tracks) if track.signature != signature]
+    await asyncio.gather(*(adjust(index, track) for index, track in mismatched))
+    log(f"{len(tracks) - len(mismatched)} de {len(tracks)} pistas se copian sin recodificar")
+
+    list_path = os.path.join(work_dir, "tracks.txt")
+    chapters_path = os.path.join(work_dir, "chapters.txt")
+    write_concat_list(tracks, list_path)
+    write_chapters(tracks, chapters_path, album_title)
+
+    return ConversionJob(
+        list_path, output_file, input_format='concat', input_options=['-safe', '0'],
+        metadata_file=chapters_path, duration=sum(track.duration for track in tracks),
+        on_log=on_log, **job_options
+    )
+
+
+async def build_album(engine, inputs, output_file, album_title=None, on_log=None, **job_options):
+    # Preparar y ejecutar la unión; la carpeta temporal se borra al terminar
+    work_dir = tempfile.mkdtemp(prefix="album_")
+    try:
+        job = await prepare_album(engine, inputs, output_file, work_dir, album_title, on_log, **job_options)
+        return await engine.run_job(job)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Une las pistas de un álbum en un único MP4 con capítulos")
+    parser.add_argument("inputs", nargs="+", help="Pistas en orden o listas de reproducción .m3u")
+    parser.add_argument("-o", "--output", required=True, help="Archivo MP4 de salida")
+    parser.add_argument("-j", "--jobs", type=int, default=max(1, (os.cpu_count() or 4) // 2),
+                        help="Pistas a recodificar simultáneamente")
+    parser.add_argument("--title", help="Título del álbum")
+    parser.add_argument("--preset", default="ultrafast")
+    parser.add_argument("--no-hwaccel", action="store_true")
+    args = parser.parse_args(argv)
+
+    inputs = expand_inputs(args.inputs)
+    if not inputs:
+        parser.error("la lista de reproducción está vacía")
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+
+    engine = ConversionEngine(max_concurrent=args.jobs)
+    try:
+        job = asyncio.run(build_album(
+            engine, inputs, args.output, album_title=args.title,
+            on_log=lambda message: print(message, file=sys.stderr),
+            preset=args.preset, use_hwaccel=not args.no_hwaccel
+        ))
+    except RuntimeError as e:
+        print(f"ERROR\t{e}", file=sys.stderr)
+        return 1
+    print(f"{'OK' if job.success else 'ERROR'}\t{args.output}\t{job.message}")
+    return 0 if job.success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
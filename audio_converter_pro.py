@@ -1,139 +1,96 @@
 import os
 import sys
-import subprocess
-import re
 import datetime
-import json
+import heapq
+import itertools
+import tempfile
+
+# Si ya hay una ventana abierta, enviarle los archivos y salir sin cargar PyQt5
+if __name__ == "__main__" and "--new-instance" not in sys.argv:
+    import single_instance
+    if single_instance.forward_to_running_instance(sys.argv[1:]):
+        sys.exit(0)
+
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                            QLabel, QPushButton, QFileDialog, QProgressBar, QTextEdit, 
                            QLineEdit, QMessageBox, QGroupBox, QFormLayout, QComboBox,
                            QFrame, QSplitter, QTabWidget, QSizePolicy, QScrollArea,
                            QStackedWidget, QTableWidget, QTableWidgetItem, QHeaderView)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, pyqtSlot, QSize, QPropertyAnimation, QEasingCurve, QDate
+from PyQt5.QtCore import (Qt, QObject, QThread, QTimer, pyqtSignal, pyqtSlot, QSize, QPropertyAnimation,
+                          QEasingCurve, QDate)
 from PyQt5.QtGui import QIcon, QFont, QColor, QPalette, QCursor
+from PyQt5.QtNetwork import QLocalServer, QLocalSocket
+import conversion_history
+import single_instance
+import library_scan
+from conversion_engine import (ConversionJob, get_default_engine, output_path_for, DEFAULT_OUTPUT_FOLDER,
+                               PROGRESS_UNKNOWN)
+from staging import StagingArea
+from eta import SpeedModel, format_duration
+
+# Carpeta temporal local para la preparación de entradas y salidas
+STAGING_FOLDER = os.path.join(tempfile.gettempdir(), "AudioConverterPro_Staging")
+
+# Con la cola activa, el historial se guarda como mucho una vez cada 2 segundos
+HISTORY_SAVE_DELAY_MS = 2000
 
-class ConversionThread(QThread):
+# Opciones de normalización de la configuración: (texto, LUFS)
+LOUDNESS_OPTIONS = [("Desactivada", None), ("-16 LUFS (streaming)", -16.0), ("-23 LUFS (EBU R128)", -23.0)]
+
+# Trabajos de la cola entregados al motor a la vez; el resto espera en un
+# montículo ligero, ordenado de mayor a menor duración prevista, para que
+# importar una biblioteca enorme no cree un objeto Qt y una tarea del motor por
+# archivo sin perder el orden de los más largos primero entre todos ellos
+QUEUE_WINDOW = 64
+
+class ConversionThread(QObject):
+    """Puente entre el motor de conversión asíncrono y la interfaz Qt.
+    
+    Mantiene la interfaz del antiguo hilo de conversión (start, cancel, isRunning
+    y las mismas señales), pero la conversión se ejecuta en el bucle de eventos
+    compartido del motor en lugar de ocupar un hilo por trabajo.
+    """
     progress_update = pyqtSignal(int)
     log_update = pyqtSignal(str)
     conversion_finished = pyqtSignal(bool, str, str, str)  # success, message, input_file, output_file
     
-    def __init__(self, input_file, output_file):
+    def __init__(self, input_file, output_file, engine=None, **job_options):
         super().__init__()
         self.input_file = input_file
         self.output_file = output_file
-        self.is_cancelled = False
-        # Valores predeterminados fijos
-        self.preset = "ultrafast"
-        self.use_hwaccel = True
-        
-    def run(self):
-        try:
-            # Obtener el número de núcleos del CPU
-            cpu_count = os.cpu_count() or 4
-            
-            # Configuración básica de FFmpeg
-            cmd = [
-                'ffmpeg',
-                '-y'  # Sobrescribir archivo de salida sin preguntar
-            ]
-            
-            # Añadir aceleración por hardware (siempre activada)
-            cmd.extend(['-hwaccel', 'auto'])
-            
-            # Configuración de entrada y filtros optimizados
-            cmd.extend([
-                '-i', self.input_file,
-                '-f', 'lavfi',
-                '-i', 'color=c=black:s=1280x720:r=30',
-                '-shortest',
-                '-c:a', 'copy',  # Copiar audio sin recodificar
-                '-c:v', 'libx264',
-                '-preset', 'ultrafast',  # Siempre usando preset ultrafast
-                '-tune', 'fastdecode',  # Optimizar para decodificación rápida
-                '-pix_fmt', 'yuv420p',
-                '-threads', str(cpu_count),
-                self.output_file
-            ])
-            
-            self.log_update.emit(f"Iniciando conversión de {os.path.basename(self.input_file)}")
-            self.log_update.emit(f"Usando preset: ultrafast con {cpu_count} threads")
-            
-            process = subprocess.Popen(
-                cmd, 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.PIPE, 
-                universal_newlines=True,
-                bufsize=1  # Line buffered para mejor respuesta
-            )
-            
-            duration = self._get_duration(self.input_file)
-            if not duration or duration <= 0:
-                self.log_update.emit("Usando duración predeterminada: 100 segundos")
-                duration = 100
-            
-            line_count = 0    
-            for line in process.stderr:
-                line_count += 1
-                
-                if self.is_cancelled:
-                    process.terminate()
-                    self.log_update.emit("Conversión cancelada")
-                    self.conversion_finished.emit(False, "Conversión cancelada por el usuario", self.input_file, "")
-                    return
-                
-                # Reducir la frecuencia de actualizaciones del log para mejor rendimiento
-                if line_count % 30 == 0:
-                    self.log_update.emit(line.strip())
-                
-                time_match = re.search(r'time=(\S+)', line)
-                if time_match:
-                    try:
-                        time_str = time_match.group(1)
-                        current_time = self._time_to_seconds(time_str)
-                        progress = min(int(current_time / duration * 100), 100)
-                        self.progress_update.emit(progress)
-                    except Exception as e:
-                        pass  # Ignorar errores de procesamiento de tiempo para no saturar el log
-            
-            process.wait()
-            
-            if process.returncode == 0:
-                self.progress_update.emit(100)
-                self.log_update.emit(f"Archivo guardado en: {self.output_file}")
-                self.conversion_finished.emit(True, "Conversión exitosa", self.input_file, self.output_file)
-            else:
-                error_msg = f"Error en la conversión. Código: {process.returncode}"
-                self.log_update.emit(error_msg)
-                self.conversion_finished.emit(False, error_msg, self.input_file, "")
-                
-        except Exception as e:
-            self.log_update.emit(f"Error crítico: {str(e)}")
-            self.conversion_finished.emit(False, str(e), self.input_file, "")
+        self.engine = engine or get_default_engine()
+        # Las señales se emiten desde el hilo del motor; Qt las encola hacia la interfaz
+        self.job = ConversionJob(
+            input_file, output_file,
+            on_progress=self.progress_update.emit,
+            on_log=self.log_update.emit,
+            on_finished=self._on_job_finished,
+            **job_options
+        )
+    
+    def start(self):
+        self.engine.submit(self.job)
     
     def cancel(self):
-        self.is_cancelled = True
+        self.engine.cancel(self.job)
     
-    def _get_duration(self, file_path):
-        try:
-            cmd = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', 
-                  '-of', 'default=noprint_wrappers=1:nokey=1', file_path]
-            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            return float(result.stdout.strip())
-        except:
-            return None
+    def isRunning(self):
+        return self.job.state in ("pending", "running", "verifying")
     
-    def _time_to_seconds(self, time_str):
-        try:
-            parts = time_str.split(':')
-            if len(parts) == 3:
-                h, m, s = parts
-                return int(h) * 3600 + int(m) * 60 + float(s.split('.')[0])
-            elif len(parts) == 2:
-                m, s = parts
-                return int(m) * 60 + float(s.split('.')[0])
-            return float(time_str)
-        except:
-            return 0
+    def _on_job_finished(self, job):
+        output_file = job.output_file if job.success else ""
+        self.conversion_finished.emit(job.success, job.message, job.input_file, output_file)
+
+class HistoryLoaderThread(QThread):
+    """Hilo que lee el historial de conversiones sin bloquear el arranque"""
+    history_loaded = pyqtSignal(list)
+    
+    def __init__(self, history_file):
+        super().__init__()
+        self.history_file = history_file
+    
+    def run(self):
+        self.history_loaded.emit(conversion_history.read_history(self.history_file))
 
 class Card(QFrame):
     """Widget personalizado para crear tarjetas con estilo minimalista"""
@@ -309,20 +266,78 @@ class ModernProgressBar(QProgressBar):
         self.setFixedHeight(20)
         self.setTextVisible(True)
 
+class LibraryScanThread(QThread):
+    """Hilo que explora carpetas y entrega los archivos encontrados por lotes"""
+    files_found = pyqtSignal(list)  # [(ruta, tamaño, carpeta explorada), ...]
+    
+    def __init__(self, folders, extensions):
+        super().__init__()
+        self.folders = folders
+        self.extensions = extensions
+        self.found = 0
+        # isInterruptionRequested deja de valer True cuando el hilo termina
+        self.cancelled = False
+    
+    def cancel(self):
+        self.cancelled = True
+        self.requestInterruption()
+    
+    def run(self):
+        # Cada carpeta por separado: las salidas conservan la ruta relativa a ella
+        for folder in self.folders:
+            if self.isInterruptionRequested():
+                return
+            for batch in library_scan.iter_batches([folder], self.extensions,
+                                                   should_stop=self.isInterruptionRequested):
+                self.found += len(batch)
+                self.files_found.emit([(path, size, folder) for path, size in batch])
+
 class AudioConverterApp(QMainWindow):
     def __init__(self):
         super().__init__()
         # Definir la ruta de salida como atributo de clase
-        self.output_folder = os.path.join(os.path.expanduser("~"), "AudioConverterPro_Output")
+        self.output_folder = DEFAULT_OUTPUT_FOLDER
         os.makedirs(self.output_folder, exist_ok=True)
         
+        # Vídeo generado: fondo negro o visualizador de forma de onda
+        self.use_visualizer = False
+        # Sonoridad objetivo en LUFS (None: sin normalizar)
+        self.loudness_target = None
+        # Recortar el silencio del principio y del final de cada archivo
+        self.trim_silence = False
+        
         # Historial de conversiones (lista de diccionarios con información)
+        # Se carga en segundo plano para no retrasar la aparición de la ventana
         self.conversion_history = []
-        self.load_history()  # Cargar historial desde archivo
+        self.history_loaded = False
+        self.history_save_pending = False
+        self.history_loader = None
+        self.history_save_timer = QTimer(self)
+        self.history_save_timer.setSingleShot(True)
+        self.history_save_timer.setInterval(HISTORY_SAVE_DELAY_MS)
+        self.history_save_timer.timeout.connect(self.save_history)
+        
+        # Cola de conversiones (archivos recibidos de otras ventanas, etc.)
+        self.queue_jobs = set()
+        self.queue_backlog = []  # montículo de (-segundos estimados, orden, ruta, carpeta) sin entregar al motor
+        self.queue_sequence = itertools.count()
+        self.queue_backlog_seconds = 0.0
+        self.scan_threads = set()
+        self.queue_done = 0
+        self.queue_failed = 0
+        self.instance_server = None
+        # Actualizar el tiempo restante estimado mientras haya cola
+        self.queue_timer = QTimer(self)
+        self.queue_timer.setInterval(1000)
+        self.queue_timer.timeout.connect(self.update_queue_summary)
         
         self.init_ui()
         self.conversion_thread = None
         self.setWindowTitle("Audio Converter Pro")
+        # Arrastrar archivos o carpetas a la ventana los añade a la cola
+        self.setAcceptDrops(True)
+        
+        self.load_history()  # Cargar historial desde archivo
         
     def init_ui(self):
         # Configuración básica de la ventana
@@ -456,11 +471,17 @@ class AudioConverterApp(QMainWindow):
             }
         """)
         
-        # Añadir páginas al stack
+        # Añadir páginas al stack. Solo el panel principal se construye al
+        # arrancar; el resto se crea la primera vez que se abre
         self.init_dashboard_page()     # Página 0: Panel Principal
-        self.init_settings_page()      # Página 1: Configuración
-        self.init_history_page()       # Página 2: Historial
-        self.init_about_page()         # Página 3: Acerca de
+        self.page_builders = {
+            1: self.init_settings_page,    # Página 1: Configuración
+            2: self.init_history_page,     # Página 2: Historial
+            3: self.init_about_page,       # Página 3: Acerca de
+        }
+        self.built_pages = {0}
+        for _ in self.page_builders:
+            self.content_stack.addWidget(QWidget())
         
         # Añadir stack al layout principal
         main_layout.addWidget(self.content_stack)
@@ -511,8 +532,12 @@ class AudioConverterApp(QMainWindow):
         self.btn_browse = PrimaryButton("Examinar")
         self.btn_browse.setFixedWidth(120)
         self.btn_browse.clicked.connect(self.browse_file)
+        self.btn_import_folder = SecondaryButton("Importar carpeta")
+        self.btn_import_folder.setFixedWidth(150)
+        self.btn_import_folder.clicked.connect(self.import_folder)
         input_layout.addWidget(self.input_path)
         input_layout.addWidget(self.btn_browse)
+        input_layout.addWidget(self.btn_import_folder)
         file_layout.addLayout(input_layout)
         
         file_card.addLayout(file_layout)
@@ -573,6 +598,24 @@ class AudioConverterApp(QMainWindow):
         progress_card.addLayout(progress_layout)
         dashboard_layout.addWidget(progress_card)
         
+        # Card de cola
+        queue_card = Card("Cola de Conversión")
+        queue_layout = QHBoxLayout()
+        
+        self.queue_label = QLabel()
+        self.queue_label.setStyleSheet("color: #555;")
+        queue_layout.addWidget(self.queue_label)
+        queue_layout.addStretch()
+        
+        self.btn_cancel_queue = DangerButton("Cancelar cola")
+        self.btn_cancel_queue.setFixedWidth(150)
+        self.btn_cancel_queue.clicked.connect(self.cancel_queue)
+        queue_layout.addWidget(self.btn_cancel_queue)
+        
+        queue_card.addLayout(queue_layout)
+        dashboard_layout.addWidget(queue_card)
+        self.update_queue_summary()
+        
         # Card de log
         log_card = Card("Registro de Actividad")
         log_layout = QVBoxLayout()
@@ -665,6 +708,58 @@ class AudioConverterApp(QMainWindow):
         self.hwaccel_combo.setCurrentIndex(0)  # Activada por defecto
         options_form.addRow(hwaccel_label, self.hwaccel_combo)
         
+        # Preparación en disco local (útil con entradas o salidas en red)
+        staging_label = QLabel("Preparación en disco local:")
+        staging_label.setStyleSheet("font-weight: bold; color: #555;")
+        self.staging_combo = QComboBox()
+        self.staging_combo.addItems(["Desactivada", "Activada"])
+        self.staging_combo.setCurrentIndex(1 if get_default_engine().staging else 0)
+        self.staging_combo.setToolTip("Copia las entradas a una carpeta temporal local y mueve "
+                                      "cada salida a su destino al terminar")
+        options_form.addRow(staging_label, self.staging_combo)
+        
+        # Conversiones simultáneas del motor compartido
+        concurrency_label = QLabel("Conversiones simultáneas:")
+        concurrency_label.setStyleSheet("font-weight: bold; color: #555;")
+        self.concurrency_combo = QComboBox()
+        engine = get_default_engine()
+        self.concurrency_combo.addItems(
+            [str(n) for n in range(1, max(engine.cpu_count, engine.max_concurrent) + 1)])
+        self.concurrency_combo.setCurrentIndex(engine.max_concurrent - 1)
+        self.concurrency_combo.setToolTip("Número de archivos que se convierten a la vez; los núcleos "
+                                          "del procesador se reparten entre ellos")
+        options_form.addRow(concurrency_label, self.concurrency_combo)
+        
+        # Vídeo generado
+        video_label = QLabel("Vídeo:")
+        video_label.setStyleSheet("font-weight: bold; color: #555;")
+        self.video_combo = QComboBox()
+        self.video_combo.addItems(["Fondo negro", "Visualizador de forma de onda"])
+        self.video_combo.setCurrentIndex(1 if self.use_visualizer else 0)
+        self.video_combo.setToolTip("El visualizador dibuja la forma de onda a pocos fotogramas "
+                                    "por segundo para limitar el coste de la conversión")
+        options_form.addRow(video_label, self.video_combo)
+        
+        # Normalización de sonoridad
+        loudness_label = QLabel("Normalización de volumen:")
+        loudness_label.setStyleSheet("font-weight: bold; color: #555;")
+        self.loudness_combo = QComboBox()
+        self.loudness_combo.addItems([name for name, _ in LOUDNESS_OPTIONS])
+        self.loudness_combo.setCurrentIndex(
+            [target for _, target in LOUDNESS_OPTIONS].index(self.loudness_target))
+        self.loudness_combo.setToolTip("La primera conversión de cada archivo mide su sonoridad; "
+                                       "las siguientes solo aplican una ganancia")
+        options_form.addRow(loudness_label, self.loudness_combo)
+        
+        # Recorte de silencio
+        trim_label = QLabel("Recortar silencios:")
+        trim_label.setStyleSheet("font-weight: bold; color: #555;")
+        self.trim_combo = QComboBox()
+        self.trim_combo.addItems(["Desactivado", "Activado"])
+        self.trim_combo.setCurrentIndex(1 if self.trim_silence else 0)
+        self.trim_combo.setToolTip("Elimina el silencio del principio y del final de cada grabación")
+        options_form.addRow(trim_label, self.trim_combo)
+        
         general_layout.addLayout(options_form)
         
         # Botón para guardar configuración
@@ -682,8 +777,7 @@ class AudioConverterApp(QMainWindow):
         # Añadir espacio al final
         settings_layout.addStretch()
         
-        # Añadir la página al stack
-        self.content_stack.addWidget(settings_page)
+        return settings_page
     
     def init_history_page(self):
         # Página de historial
@@ -722,9 +816,6 @@ class AudioConverterApp(QMainWindow):
             }
         """)
         
-        # Actualizar tabla con datos del historial
-        self.update_history_table()
-        
         history_card_layout.addWidget(self.history_table)
         
         # Botones de acción
@@ -740,20 +831,23 @@ class AudioConverterApp(QMainWindow):
         history_buttons_layout.addWidget(self.btn_refresh_history)
         history_buttons_layout.addWidget(self.btn_clear_history)
         
+        # No permitir borrar mientras el historial se sigue cargando
+        self.btn_clear_history.setEnabled(self.history_loaded)
+        
         history_card_layout.addLayout(history_buttons_layout)
         
         history_card.addLayout(history_card_layout)
         history_layout.addWidget(history_card)
         
-        # Gráfico o estadísticas (Simulado)
+        # Gráfico o estadísticas
         stats_card = Card("Estadísticas de Conversión")
         stats_layout = QVBoxLayout()
         
-        stats_label = QLabel("Este mes has convertido 12 archivos con un tamaño total de 250 MB")
-        stats_label.setStyleSheet("color: #555; font-size: 14px;")
-        stats_label.setAlignment(Qt.AlignCenter)
+        self.stats_label = QLabel()
+        self.stats_label.setStyleSheet("color: #555; font-size: 14px;")
+        self.stats_label.setAlignment(Qt.AlignCenter)
         
-        stats_layout.addWidget(stats_label)
+        stats_layout.addWidget(self.stats_label)
         
         # Añadir un gráfico simulado (solo una imagen simulada)
         chart_placeholder = QLabel()
@@ -770,8 +864,7 @@ class AudioConverterApp(QMainWindow):
         # Añadir espacio al final
         history_layout.addStretch()
         
-        # Añadir la página al stack
-        self.content_stack.addWidget(history_page)
+        return history_page
     
     def init_about_page(self):
         # Página de acerca de
@@ -895,12 +988,23 @@ class AudioConverterApp(QMainWindow):
         license_card.addLayout(license_layout)
         about_layout.addWidget(license_card)
         
-        # Añadir la página al stack
-        self.content_stack.addWidget(about_page)
+        return about_page
     
     # ----- FUNCIONES DE NAVEGACIÓN -----
+    def ensure_page(self, index):
+        # Construir la página la primera vez que se necesita
+        if index in self.built_pages:
+            return
+        placeholder = self.content_stack.widget(index)
+        page = self.page_builders[index]()
+        self.content_stack.insertWidget(index, page)
+        self.content_stack.removeWidget(placeholder)
+        placeholder.deleteLater()
+        self.built_pages.add(index)
+    
     def change_page(self, index):
         # Cambiar a la página seleccionada
+        self.ensure_page(index)
         self.content_stack.setCurrentIndex(index)
         
         # Actualizar estado de los botones
@@ -926,8 +1030,20 @@ class AudioConverterApp(QMainWindow):
             self.output_path.setText(folder)
     
     def save_settings(self):
-        # Aquí puedes guardar la configuración en un archivo
-        # Por ahora solo mostraremos un mensaje
+        # Aplicar la preparación en disco local al motor de conversión
+        engine = get_default_engine()
+        if self.staging_combo.currentIndex() == 1:
+            if engine.staging is None:
+                engine.staging = StagingArea(STAGING_FOLDER)
+        else:
+            engine.staging = None
+        engine.set_max_concurrent(self.concurrency_combo.currentIndex() + 1)
+        
+        self.use_visualizer = self.video_combo.currentIndex() == 1
+        self.loudness_target = LOUDNESS_OPTIONS[self.loudness_combo.currentIndex()][1]
+        self.trim_silence = self.trim_combo.currentIndex() == 1
+        
+        # El resto de opciones aún no se guarda en un archivo
         QMessageBox.information(
             self, 
             "Configuración guardada", 
@@ -936,38 +1052,59 @@ class AudioConverterApp(QMainWindow):
     
     # ----- FUNCIONES DE LA PÁGINA DE HISTORIAL -----
     def load_history(self):
-        # Intentar cargar historial desde archivo
-        history_file = os.path.join(self.output_folder, "conversion_history.json")
-        if os.path.exists(history_file):
-            try:
-                with open(history_file, 'r') as f:
-                    self.conversion_history = json.load(f)
-            except:
-                self.conversion_history = []
+        # Cargar historial desde archivo en un hilo aparte
+        history_file = conversion_history.history_path(self.output_folder)
+        self.history_loader = HistoryLoaderThread(history_file)
+        self.history_loader.history_loaded.connect(self.on_history_loaded)
+        self.history_loader.start()
+    
+    def on_history_loaded(self, history):
+        # Las conversiones terminadas durante la carga van después de las antiguas
+        self.conversion_history = history + self.conversion_history
+        self.history_loaded = True
+        # Aprender la velocidad de conversión de cada formato para estimar tiempos
+        get_default_engine().speed_model = SpeedModel.from_history(self.conversion_history)
+        
+        if self.history_save_pending:
+            self.history_save_pending = False
+            self.save_history()
+        
+        if 2 in self.built_pages:
+            self.btn_clear_history.setEnabled(True)
+            self.update_history_table()
     
     def save_history(self):
+        # No sobrescribir el archivo hasta haber leído su contenido
+        if not self.history_loaded:
+            self.history_save_pending = True
+            return
+        
         # Guardar historial en archivo
-        history_file = os.path.join(self.output_folder, "conversion_history.json")
+        history_file = conversion_history.history_path(self.output_folder)
         try:
-            with open(history_file, 'w') as f:
-                json.dump(self.conversion_history, f)
+            conversion_history.write_history(history_file, self.conversion_history)
         except:
             pass
     
-    def add_to_history(self, input_file, output_file, success):
-        # Añadir nueva conversión al historial
-        now = datetime.datetime.now()
-        
-        self.conversion_history.append({
-            "date": now.strftime("%Y-%m-%d %H:%M"),
-            "input_file": input_file,
-            "output_file": output_file,
-            "format": os.path.splitext(input_file)[1][1:].upper(),
-            "success": success
-        })
+    def schedule_history_save(self):
+        # Agrupar en una sola escritura las conversiones que terminan seguidas
+        if not self.history_save_timer.isActive():
+            self.history_save_timer.start()
+    
+    def add_to_history(self, input_file, output_file, success, job=None, save=True):
+        # Añadir nueva conversión al historial (con datos de rendimiento si hay trabajo)
+        if job is not None:
+            entry = conversion_history.entry_for_job(job)
+        else:
+            entry = conversion_history.make_entry(input_file, output_file, success)
+        self.conversion_history.append(entry)
+        get_default_engine().speed_model.add(entry)
         
         # Guardar historial actualizado
-        self.save_history()
+        if save:
+            self.save_history()
+        else:
+            self.schedule_history_save()
     
     def update_history_table(self):
         # Limpiar tabla
@@ -1024,6 +1161,25 @@ class AudioConverterApp(QMainWindow):
             action_layout.setAlignment(Qt.AlignCenter)
             
             self.history_table.setCellWidget(row_position, 4, action_widget)
+        
+        self.update_history_stats()
+    
+    def update_history_stats(self):
+        # Resumen del mes actual y rendimiento por equipo
+        month = datetime.datetime.now().strftime("%Y-%m")
+        this_month = [item for item in self.conversion_history
+                      if item["date"].startswith(month) and item["success"]]
+        total_size = sum(item.get("size") or 0 for item in this_month)
+        lines = [f"Este mes has convertido {len(this_month)} archivos "
+                 f"con un tamaño total de {total_size/1024/1024:.0f} MB"]
+        
+        nodes = conversion_history.node_throughput(self.conversion_history)
+        if len(nodes) > 1:
+            for node, stats in sorted(nodes.items()):
+                speed = f"{stats['speed']:.1f}x" if stats["speed"] else "-"
+                lines.append(f"{node}: {stats['succeeded']} archivos · "
+                             f"{stats['audio_seconds']/60:.1f} min de audio · velocidad {speed}")
+        self.stats_label.setText("\n".join(lines))
     
     def clear_history(self):
         # Pedir confirmación
@@ -1059,6 +1215,21 @@ class AudioConverterApp(QMainWindow):
             self.input_path.setText(file_path)
             self.load_file_info(file_path)
     
+    def import_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Importar carpeta de audio")
+        if folder:
+            self.enqueue_files([folder])
+    
+    def dragEnterEvent(self, event):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+    
+    def dropEvent(self, event):
+        paths = [url.toLocalFile() for url in event.mimeData().urls() if url.isLocalFile()]
+        if paths:
+            event.acceptProposedAction()
+            self.enqueue_files(paths)
+    
     def load_file_info(self, file_path):
         try:
             self.file_name.setText(os.path.basename(file_path))
@@ -1080,21 +1251,30 @@ class AudioConverterApp(QMainWindow):
             QMessageBox.warning(self, "Error", "Seleccione un archivo de entrada")
             return
         
-        output_name = os.path.splitext(os.path.basename(input_file))[0] + ".mp4"
-        output_file = os.path.join(self.output_folder, output_name)
+        output_file = output_path_for(input_file, self.output_folder)
         
-        self.conversion_thread = ConversionThread(input_file, output_file)
-        self.conversion_thread.progress_update.connect(self.progress_bar.setValue)
+        self.conversion_thread = ConversionThread(input_file, output_file, visualizer=self.use_visualizer,
+                                                  loudness_target=self.loudness_target,
+                                                  trim_silence=self.trim_silence)
+        self.conversion_thread.progress_update.connect(self.update_progress)
         self.conversion_thread.log_update.connect(self.log.append)
         self.conversion_thread.conversion_finished.connect(self.conversion_done)
         
         self.btn_convert.setEnabled(False)
         self.btn_clear.setEnabled(False)
         self.btn_cancel.setEnabled(True)
-        self.progress_bar.setValue(0)
+        self.update_progress(0)
         self.log.append("Iniciando proceso de conversión...")
         self.conversion_thread.start()
     
+    def update_progress(self, value):
+        # Barra indeterminada cuando no se conoce la duración del archivo
+        if value == PROGRESS_UNKNOWN:
+            self.progress_bar.setRange(0, 0)
+        else:
+            self.progress_bar.setRange(0, 100)
+            self.progress_bar.setValue(value)
+    
     def cancel_conversion(self):
         if self.conversion_thread and self.conversion_thread.isRunning():
             self.conversion_thread.cancel()
@@ -1106,8 +1286,12 @@ class AudioConverterApp(QMainWindow):
         self.btn_clear.setEnabled(True)
         self.btn_cancel.setEnabled(False)
         
+        # Salir del modo indeterminado si la conversión terminó sin éxito
+        if self.progress_bar.maximum() == 0:
+            self.update_progress(0)
+        
         # Añadir al historial
-        self.add_to_history(input_file, output_file, success)
+        self.add_to_history(input_file, output_file, success, self.conversion_thread.job)
         
         if success:
             self.log.append("¡Conversión completada exitosamente!")
@@ -1118,12 +1302,197 @@ class AudioConverterApp(QMainWindow):
             self.log.append(f"Error en la conversión: {message}")
             QMessageBox.critical(self, "Error", message)
     
+    # ----- COLA DE CONVERSIÓN -----
+    def queue_active(self):
+        return bool(self.queue_jobs or self.queue_backlog or self.scan_threads)
+    
+    def enqueue_files(self, paths):
+        # Añadir archivos a la cola; las carpetas se exploran en segundo plano
+        entries = []
+        folders = []
+        for path in paths:
+            if os.path.isdir(path):
+                folders.append(path)
+            elif os.path.isfile(path):
+                entries.append((path, None, None))
+            else:
+                self.log.append(f"No se encontró el archivo: {path}")
+        if folders:
+            self.start_library_scan(folders)
+        if entries:
+            self.queue_entries(entries)
+            self.log.append(f"{len(entries)} archivos añadidos a la cola")
+    
+    def queue_entries(self, entries):
+        # entries: [(ruta, tamaño o None, carpeta importada o None)]; la estimación
+        # alimenta el tiempo restante
+        if not self.queue_active():
+            self.queue_done = 0
+            self.queue_failed = 0
+        speed_model = get_default_engine().speed_model
+        for path, size, root in entries:
+            seconds = speed_model.predict(path, size=size) or 0
+            heapq.heappush(self.queue_backlog, (-seconds, next(self.queue_sequence), path, root))
+            self.queue_backlog_seconds += seconds
+        self.feed_queue()
+        self.update_queue_summary()
+    
+    def feed_queue(self):
+        # Entregar al motor los archivos más largos hasta llenar la ventana de la cola
+        while self.queue_backlog and len(self.queue_jobs) < QUEUE_WINDOW:
+            negative_seconds, _, path, root = heapq.heappop(self.queue_backlog)
+            self.queue_backlog_seconds += negative_seconds
+            # Los archivos de una carpeta importada mantienen su estructura
+            output_file = output_path_for(path, self.output_folder, root)
+            os.makedirs(os.path.dirname(output_file), exist_ok=True)
+            thread = ConversionThread(path, output_file,
+                                      visualizer=self.use_visualizer, loudness_target=self.loudness_target,
+                                      trim_silence=self.trim_silence)
+            thread.progress_update.connect(self.update_progress)
+            thread.conversion_finished.connect(
+                lambda success, message, input_file, output_file, thread=thread:
+                    self.queued_conversion_done(thread, success, message, input_file, output_file))
+            self.queue_jobs.add(thread)
+            thread.start()
+        if not self.queue_backlog:
+            self.queue_backlog_seconds = 0.0
+    
+    def start_library_scan(self, folders):
+        # Importar las extensiones de la lista de formatos admitidos
+        extensions = [self.format_combo.itemText(i) for i in range(self.format_combo.count())]
+        thread = LibraryScanThread(folders, extensions)
+        thread.files_found.connect(lambda batch, thread=thread: self.on_files_found(thread, batch))
+        thread.finished.connect(lambda thread=thread: self.library_scan_done(thread))
+        self.scan_threads.add(thread)
+        self.log.append(f"Explorando {', '.join(folders)}...")
+        thread.start()
+        self.update_queue_summary()
+    
+    def on_files_found(self, thread, batch):
+        # Descartar los lotes que ya estaban en camino al cancelar la cola
+        if not thread.cancelled:
+            self.queue_entries(batch)
+    
+    def library_scan_done(self, thread):
+        self.scan_threads.discard(thread)
+        if thread.cancelled:
+            self.log.append(f"Exploración cancelada tras encontrar {thread.found} archivos")
+        else:
+            self.log.append(f"Exploración terminada: {thread.found} archivos encontrados")
+        thread.deleteLater()
+        if not self.queue_active() and thread.found:
+            self.log.append(f"Cola terminada: {self.queue_done} convertidos, {self.queue_failed} con error")
+        self.update_queue_summary()
+    
+    def queued_conversion_done(self, thread, success, message, input_file, output_file):
+        # Sin ventanas emergentes: un trabajo de la cola solo deja una línea en el log
+        self.queue_jobs.discard(thread)
+        self.feed_queue()
+        self.add_to_history(input_file, output_file, success, thread.job, save=False)
+        if success:
+            self.queue_done += 1
+            self.log.append(f"Convertido: {os.path.basename(input_file)}")
+        else:
+            self.queue_failed += 1
+            self.log.append(f"Error en {os.path.basename(input_file)}: {message}")
+        
+        if self.progress_bar.maximum() == 0:
+            self.update_progress(0)
+        if not self.queue_active():
+            self.log.append(f"Cola terminada: {self.queue_done} convertidos, {self.queue_failed} con error")
+        self.update_queue_summary()
+    
+    def update_queue_summary(self):
+        active = self.queue_active()
+        if not active and not self.queue_done and not self.queue_failed:
+            self.queue_label.setText("La cola está vacía")
+        else:
+            queued = len(self.queue_jobs) + len(self.queue_backlog)
+            text = f"{queued} en cola · {self.queue_done} convertidos · {self.queue_failed} con error"
+            if self.queue_jobs:
+                # Los archivos aún no entregados al motor se reparten entre sus huecos
+                engine = get_default_engine()
+                eta = engine.batch_eta() + self.queue_backlog_seconds / engine.max_concurrent
+                text += f" · tiempo restante estimado: {format_duration(eta)}"
+            if self.scan_threads:
+                text += " · explorando carpetas..."
+            self.queue_label.setText(text)
+        self.btn_cancel_queue.setEnabled(active)
+        if active and not self.queue_timer.isActive():
+            self.queue_timer.start()
+        elif not active:
+            self.queue_timer.stop()
+    
+    def cancel_queue(self):
+        # Detener las exploraciones y vaciar la lista antes de cancelar lo entregado al motor
+        for scan in self.scan_threads:
+            scan.cancel()
+        self.queue_backlog.clear()
+        self.queue_backlog_seconds = 0.0
+        for thread in list(self.queue_jobs):
+            thread.cancel()
+        self.log.append("Cancelando la cola de conversión...")
+        self.update_queue_summary()
+    
+    # ----- INSTANCIA ÚNICA -----
+    def start_instance_server(self):
+        # Recibir los archivos de las siguientes ejecuciones de la aplicación
+        self.instance_server = QLocalServer(self)
+        name = single_instance.listen_name()
+        if not self.instance_server.listen(name):
+            # Socket abandonado por una ventana anterior que no se cerró bien
+            QLocalServer.removeServer(name)
+            if not self.instance_server.listen(name):
+                self.instance_server = None
+                return
+        self.instance_server.newConnection.connect(self.on_instance_connection)
+    
+    def on_instance_connection(self):
+        while self.instance_server.hasPendingConnections():
+            connection = self.instance_server.nextPendingConnection()
+            buffer = bytearray()
+            connection.readyRead.connect(lambda c=connection, b=buffer: b.extend(bytes(c.readAll())))
+            connection.disconnected.connect(lambda c=connection, b=buffer: self.on_instance_message(c, b))
+            if connection.state() == QLocalSocket.UnconnectedState:
+                self.on_instance_message(connection, buffer)
+    
+    def on_instance_message(self, connection, buffer):
+        # Procesar cada conexión una sola vez
+        connection.readyRead.disconnect()
+        connection.disconnected.disconnect()
+        buffer.extend(bytes(connection.readAll()))
+        connection.deleteLater()
+        files = single_instance.decode_message(bytes(buffer))
+        buffer.clear()
+        if files:
+            self.enqueue_files(files)
+        # Traer la ventana al frente
+        self.showNormal()
+        self.raise_()
+        self.activateWindow()
+    
+    def closeEvent(self, event):
+        # Esperar a que termine la carga del historial antes de cerrar
+        if self.history_loader and self.history_loader.isRunning():
+            self.history_loader.wait()
+        # Detener las exploraciones de carpetas
+        for scan in list(self.scan_threads):
+            scan.cancel()
+            scan.wait()
+        # Guardar el historial pendiente de la cola
+        if self.history_save_timer.isActive():
+            self.history_save_timer.stop()
+            self.save_history()
+        # Detener las conversiones en curso para no dejar procesos de FFmpeg huérfanos
+        get_default_engine().shutdown()
+        super().closeEvent(event)
+    
     def reset_ui(self):
         # Limpiar campos
         self.input_path.clear()
         self.file_name.setText("No seleccionado")
         self.file_size.setText("-")
-        self.progress_bar.setValue(0)
+        self.update_progress(0)
         
         # Limpiar log o agregar separador
         self.log.clear()
@@ -1142,4 +1511,11 @@ if __name__ == "__main__":
     
     window = AudioConverterApp()
     window.show()
+    
+    # Instancia única: las siguientes ejecuciones envían sus archivos a esta ventana
+    if "--new-instance" not in sys.argv:
+        window.start_instance_server()
+    files = [arg for arg in sys.argv[1:] if arg != "--new-instance"]
+    if files:
+        window.enqueue_files(files)
     sys.exit(app.exec_())
\ No newline at end of file
@@ -0,0 +1,125 @@
+"""Benchmark de la sobrecarga del motor de conversión según la concurrencia.
+
+Sustituye FFmpeg y FFprobe por scripts de shell que solo emiten líneas de
+progreso y crean una salida mínima, de modo que lo medido es el coste del
+propio motor: tiempo de CPU del proceso, hilos del sistema y tiempo total
+frente al ideal.
+
+Uso (solo Unix):
+    python benchmarks/bench_engine.py --concurrency 1 10 100 500
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import resource
+import tempfile
+import datetime
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from conversion_engine import ConversionEngine, ConversionJob
+
+FAKE_FFMPEG = """#!/bin/sh
+i=0
+while [ $i -lt {steps} ]; do
+    i=$((i + 1))
+    printf "frame=%d fps=30 size=1kB time=00:00:%02d.00 bitrate=1kbits/s speed=1x\\r" $i $i >&2
+    sleep {interval}
+done
+# El último argumento es la salida: el motor comprueba que exista y no esté vacía
+for output; do :; done
+printf x > "$output"
+"""
+
+FAKE_FFPROBE = """#!/bin/sh
+echo {steps}
+"""
+
+
+def write_script(folder, name, content):
+    path = os.path.join(folder, name)
+    with open(path, 'w') as f:
+        f.write(content)
+    os.chmod(path, 0o755)
+    return path
+
+
+def run_level(folder, concurrency, steps, interval):
+    engine = ConversionEngine(
+        max_concurrent=concurrency,
+        ffmpeg=write_script(folder, "ffmpeg", FAKE_FFMPEG.format(steps=steps, interval=interval)),
+        ffprobe=write_script(folder, "ffprobe", FAKE_FFPROBE.format(steps=steps)),
+        # Solo la sobrecarga del motor: sin límite por dispositivo ni verificación
+        io_aware=False,
+        verify_outputs=False
+    )
+    updates = [0]
+
+    def on_progress(value):
+        updates[0] += 1
+
+    jobs = [ConversionJob(f"in_{i}.mp3", os.path.join(folder, f"out_{i}.mp4"), on_progress=on_progress)
+            for i in range(concurrency)]
+
+    peak_threads = [threading.active_count()]
+
+    async def sample_threads():
+        while True:
+            peak_threads[0] = max(peak_threads[0], threading.active_count())
+            await asyncio.sleep(0.05)
+
+    async def run():
+        sampler = asyncio.ensure_future(sample_threads())
+        await engine.run_all(jobs)
+        sampler.cancel()
+
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+    asyncio.run(run())
+    wall = time.perf_counter() - start
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+
+    cpu = (usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime)
+    return {
+        "concurrency": concurrency,
+        "wall_s": wall,
+        "ideal_s": steps * interval,
+        "engine_cpu_s": cpu,
+        "engine_cpu_per_job_ms": cpu / concurrency * 1000,
+        "progress_updates": updates[0],
+        "peak_threads": peak_threads[0],
+        "failed": sum(1 for job in jobs if not job.success)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 100, 500])
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.1)
+    parser.add_argument("--output", help="Archivo JSON Lines donde añadir los resultados")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        for concurrency in args.concurrency:
+            row = run_level(folder, concurrency, args.steps, args.interval)
+            results.append(row)
+            print(f"concurrencia={concurrency:>5}  total={row['wall_s']:.2f}s (ideal {row['ideal_s']:.2f}s)  "
+                  f"CPU/trabajo={row['engine_cpu_per_job_ms']:.2f}ms  hilos={row['peak_threads']}  "
+                  f"fallidos={row['failed']}")
+
+    if args.output:
+        with open(args.output, 'a') as f:
+            f.write(json.dumps({
+                "benchmark": "engine",
+                "date": datetime.datetime.now().strftime("%Y-%m-%d %H:%M"),
+                "results": results
+            }) + "\n")
+
+
+if __name__ == "__main__":
+    main()
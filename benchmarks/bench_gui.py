@@ -0,0 +1,230 @@
+"""Benchmark de la respuesta de la interfaz gráfica bajo carga.
+
+Ejecuta AudioConverterApp con la plataforma "offscreen" de Qt (sin pantalla) y
+mide:
+
+- history_table: tiempo de update_history_table según el tamaño del historial
+- log_append: líneas por segundo que admite log.append
+- event_loop: latencia del bucle de eventos mientras varios trabajos sintéticos
+  inundan la ventana con señales de progreso y de log desde otros hilos
+- startup: tiempo hasta la ventana mostrada y el primer pintado (bench_startup)
+
+Uso:
+    python benchmarks/bench_gui.py --history-sizes 100 1000 5000 --jobs 1 4 16 --output gui.jsonl
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import datetime
+import statistics
+import threading
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Antes de importar Qt y la aplicación: sin pantalla y con un HOME temporal
+# para no leer ni modificar el historial real
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+_home = tempfile.TemporaryDirectory()
+os.environ["HOME"] = os.environ["USERPROFILE"] = _home.name
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+import bench_startup
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def synthetic_history(size, output_folder):
+    # Mismo formato que conversion_history.make_entry
+    month = datetime.datetime.now().strftime("%Y-%m")
+    return [{
+        "date": f"{month}-01 12:00",
+        "input_file": f"/music/track_{i}.mp3",
+        "output_file": os.path.join(output_folder, f"track_{i}.mp4"),
+        "format": "MP3",
+        "success": i % 10 != 0,
+        "node": f"nodo{i % 3}",
+        "elapsed": 10.0,
+        "duration": 180.0,
+        "size": 4 * 1024 * 1024
+    } for i in range(size)]
+
+
+def drain(app):
+    # Procesar los eventos pendientes (repintados, layouts...) generados por la medida
+    app.processEvents()
+    app.sendPostedEvents()
+    app.processEvents()
+
+
+def bench_history_table(app, window, sizes, runs):
+    window.ensure_page(2)
+    results = []
+    for size in sizes:
+        window.conversion_history = synthetic_history(size, window.output_folder)
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            window.update_history_table()
+            drain(app)
+            samples.append(time.perf_counter() - start)
+        row = {"history_size": size, "runs": runs, "seconds": statistics.median(samples),
+               "ms_per_row": statistics.median(samples) / size * 1000 if size else None}
+        results.append(row)
+        print(f"update_history_table  historial={size:>7}  {row['seconds'] * 1000:.1f} ms")
+    window.conversion_history = []
+    window.update_history_table()
+    return results
+
+
+def bench_log_append(app, window, lines):
+    window.log.clear()
+    message = "frame=  123 fps=30 q=-1.0 size=    1024kB time=00:01:23.45 bitrate= 100.0kbits/s speed=4.2x"
+    start = time.perf_counter()
+    for i in range(lines):
+        window.log.append(f"{i} {message}")
+    appended = time.perf_counter() - start
+    drain(app)
+    total = time.perf_counter() - start
+    window.log.clear()
+    result = {"lines": lines, "append_s": appended, "total_s": total,
+              "lines_per_s": lines / total if total else None}
+    print(f"log.append            {lines} líneas  {result['lines_per_s']:.0f} líneas/s")
+    return result
+
+
+class SyntheticJob(QObject):
+    """Trabajo falso con las mismas señales que ConversionThread"""
+    progress_update = pyqtSignal(int)
+    log_update = pyqtSignal(str)
+    probe = pyqtSignal(float)
+
+    def __init__(self, rate, duration):
+        super().__init__()
+        self.rate = rate
+        self.duration = duration
+
+    def run(self):
+        # Emitir desde otro hilo, como hace el motor de conversión
+        interval = 1.0 / self.rate
+        end = time.perf_counter() + self.duration
+        value = 0
+        next_probe = 0
+        while time.perf_counter() < end:
+            value = (value + 1) % 101
+            self.progress_update.emit(value)
+            if value % 30 == 0:
+                self.log_update.emit(f"frame={value} time=00:00:{value:02d}.00 speed=1x")
+            now = time.perf_counter()
+            if now >= next_probe:
+                self.probe.emit(now)
+                next_probe = now + 0.01
+            time.sleep(interval)
+
+
+def bench_event_loop(app, window, jobs, rate, duration, tick_ms=5):
+    # Latencia de entrega de señales y retraso de un temporizador del hilo principal
+    delivery = []
+    ticks = []
+    last_tick = [time.perf_counter()]
+
+    def on_tick():
+        now = time.perf_counter()
+        ticks.append((now - last_tick[0]) * 1000 - tick_ms)
+        last_tick[0] = now
+
+    timer = QTimer()
+    timer.timeout.connect(on_tick)
+    timer.start(tick_ms)
+
+    workers = []
+    for _ in range(jobs):
+        job = SyntheticJob(rate, duration)
+        job.progress_update.connect(window.update_progress)
+        job.log_update.connect(window.log.append)
+        job.probe.connect(lambda sent: delivery.append((time.perf_counter() - sent) * 1000))
+        workers.append((job, threading.Thread(target=job.run, daemon=True)))
+
+    for _, thread in workers:
+        thread.start()
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end or any(thread.is_alive() for _, thread in workers):
+        app.processEvents()
+    timer.stop()
+    drain(app)
+    window.log.clear()
+
+    result = {
+        "jobs": jobs,
+        "signals_per_job_per_s": rate,
+        "duration_s": duration,
+        "delivery_p50_ms": statistics.median(delivery) if delivery else None,
+        "delivery_p95_ms": percentile(delivery, 0.95),
+        "delivery_max_ms": max(delivery) if delivery else None,
+        "timer_lateness_p95_ms": percentile(ticks, 0.95),
+        "timer_lateness_max_ms": max(ticks) if ticks else None
+    }
+    print(f"bucle de eventos      trabajos={jobs:>3}  entrega p95={result['delivery_p95_ms'] or 0:.1f} ms  "
+          f"máx={result['delivery_max_ms'] or 0:.1f} ms  retraso del temporizador p95="
+          f"{result['timer_lateness_p95_ms'] or 0:.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--history-sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--log-lines", type=int, default=5000)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 4, 16],
+                        help="Trabajos sintéticos simultáneos emitiendo progreso")
+    parser.add_argument("--signal-rate", type=int, default=200,
+                        help="Señales de progreso por segundo y por trabajo")
+    parser.add_argument("--flood-seconds", type=float, default=3)
+    parser.add_argument("--startup-sizes", type=int, nargs="*", default=[0, 1000],
+                        help="Tamaños de historial para medir el arranque (vacío para omitirlo)")
+    parser.add_argument("--output", help="Archivo JSON Lines donde añadir los resultados")
+    args = parser.parse_args()
+
+    import audio_converter_pro
+
+    app = QApplication(sys.argv[:1])
+    window = audio_converter_pro.AudioConverterApp()
+    window.show()
+    drain(app)
+
+    results = {
+        "history_table": bench_history_table(app, window, args.history_sizes, args.runs),
+        "log_append": bench_log_append(app, window, args.log_lines),
+        "event_loop": [bench_event_loop(app, window, jobs, args.signal_rate, args.flood_seconds)
+                       for jobs in args.jobs],
+    }
+    window.close()
+    drain(app)
+
+    # El arranque se mide en procesos nuevos para incluir las importaciones
+    if args.startup_sizes:
+        results["startup"] = bench_startup.run_benchmark(args.startup_sizes, args.runs)
+
+    if args.output:
+        with open(args.output, 'a') as f:
+            f.write(json.dumps({
+                "benchmark": "gui",
+                "date": datetime.datetime.now().strftime("%Y-%m-%d %H:%M"),
+                "qt_platform": os.environ["QT_QPA_PLATFORM"],
+                "results": results
+            }) + "\n")
+
+
+if __name__ == "__main__":
+    main()
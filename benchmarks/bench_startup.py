@@ -0,0 +1,117 @@
+"""Benchmark del tiempo de arranque hasta el primer pintado de la ventana.
+
+Cada muestra se ejecuta en un proceso nuevo con la plataforma "offscreen" de Qt
+y un historial sintético del tamaño indicado, de modo que el resultado incluye
+la importación de PyQt5 y la construcción de AudioConverterApp.
+
+Uso:
+    python benchmarks/bench_startup.py --sizes 0 1000 10000 --runs 5
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import datetime
+import statistics
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_synthetic_history(home, size):
+    # Crear un historial con el mismo formato que usa la aplicación
+    output_folder = os.path.join(home, "AudioConverterPro_Output")
+    os.makedirs(output_folder, exist_ok=True)
+    history = [{
+        "date": "2025-01-01 12:00",
+        "input_file": f"/music/track_{i}.mp3",
+        "output_file": os.path.join(output_folder, f"track_{i}.mp4"),
+        "format": "MP3",
+        "success": i % 10 != 0
+    } for i in range(size)]
+    with open(os.path.join(output_folder, "conversion_history.json"), 'w') as f:
+        json.dump(history, f)
+
+
+def measure_child():
+    # Proceso hijo: medir desde antes de importar la aplicación
+    start = time.perf_counter()
+    sys.path.insert(0, REPO_DIR)
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import QObject, QEvent
+    import audio_converter_pro
+
+    app = QApplication(sys.argv[:1])
+    result = {}
+
+    class FirstPaintFilter(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Paint and "first_paint" not in result:
+                result["first_paint"] = time.perf_counter() - start
+            return False
+
+    window = audio_converter_pro.AudioConverterApp()
+    result["constructed"] = time.perf_counter() - start
+    paint_filter = FirstPaintFilter()
+    window.installEventFilter(paint_filter)
+    window.show()
+    result["shown"] = time.perf_counter() - start
+
+    deadline = time.perf_counter() + 30
+    while "first_paint" not in result and time.perf_counter() < deadline:
+        app.processEvents()
+    window.close()
+    print(json.dumps(result))
+
+
+def run_sample(size):
+    with tempfile.TemporaryDirectory() as home:
+        write_synthetic_history(home, size)
+        env = dict(os.environ, HOME=home, USERPROFILE=home, QT_QPA_PLATFORM="offscreen")
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child"],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, env=env, check=True
+        ).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+
+def run_benchmark(sizes, runs):
+    results = []
+    for size in sizes:
+        samples = [run_sample(size) for _ in range(runs)]
+        row = {"history_size": size, "runs": runs}
+        for key in ("constructed", "shown", "first_paint"):
+            values = [sample[key] for sample in samples if key in sample]
+            row[key] = statistics.median(values) if values else None
+        results.append(row)
+        print(f"historial={size:>7}  construido={row['constructed']:.3f}s  "
+              f"mostrado={row['shown']:.3f}s  primer pintado={row['first_paint'] or float('nan'):.3f}s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[0, 1000, 10000])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="Archivo JSON Lines donde añadir los resultados")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        measure_child()
+        return
+
+    results = run_benchmark(args.sizes, args.runs)
+    if args.output:
+        with open(args.output, 'a') as f:
+            f.write(json.dumps({
+                "benchmark": "startup",
+                "date": datetime.datetime.now().strftime("%Y-%m-%d %H:%M"),
+                "results": results
+            }) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Benchmark del modo visualizador frente al vídeo negro.
+
+Convierte el mismo archivo con FFmpeg real en varios modos y mide el tiempo
+total y el tiempo de CPU de los procesos hijos:
+
+- black: fondo negro a 30 fps (modo por defecto)
+- visualizer_cold: forma de onda sin caché (incluye la pasada de showwavespic)
+- visualizer_warm: forma de onda ya en caché
+- showwaves_30fps: referencia con showwaves a fotogramas completos
+
+Uso (solo Unix):
+    python benchmarks/bench_visualizer.py --input /ruta/audio.mp3 --fps 2 5 10 --runs 3
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import resource
+import tempfile
+import datetime
+import statistics
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from conversion_engine import ConversionEngine, ConversionJob
+
+
+def children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def measure(function):
+    cpu_before = children_cpu()
+    start = time.perf_counter()
+    ok = function()
+    return time.perf_counter() - start, children_cpu() - cpu_before, ok
+
+
+def run_engine(engine, input_file, output_file, **options):
+    job = ConversionJob(input_file, output_file, use_hwaccel=False, **options)
+    asyncio.run(engine.run_job(job))
+    return job.success
+
+
+def run_showwaves(ffmpeg, input_file, output_file):
+    # Visualización clásica: showwaves dibuja cada fotograma a 30 fps
+    cmd = [ffmpeg, '-y', '-v', 'error', '-i', input_file, '-filter_complex',
+           '[0:a]showwaves=s=1280x720:mode=line:rate=30,format=yuv420p[v]',
+           '-map', '[v]', '-map', '0:a', '-c:a', 'copy', '-c:v', 'libx264',
+           '-preset', 'ultrafast', '-tune', 'fastdecode', output_file]
+    return subprocess.run(cmd).returncode == 0
+
+
+def summarize(mode, fps, samples):
+    walls = [wall for wall, _, _ in samples]
+    cpus = [cpu for _, cpu, _ in samples]
+    return {
+        "mode": mode,
+        "fps": fps,
+        "runs": len(samples),
+        "wall_s": statistics.median(walls),
+        "cpu_s": statistics.median(cpus),
+        "failed": sum(1 for _, _, ok in samples if not ok)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--input", required=True, help="Archivo de audio de prueba")
+    parser.add_argument("--fps", type=int, nargs="+", default=[2, 5, 10])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--ffmpeg", default="ffmpeg")
+    parser.add_argument("--no-showwaves", action="store_true",
+                        help="No medir la referencia con showwaves a 30 fps")
+    parser.add_argument("--output", help="Archivo JSON Lines donde añadir los resultados")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        output_file = os.path.join(folder, "out.mp4")
+        cache_dir = os.path.join(folder, "cache")
+        engine = ConversionEngine(max_concurrent=1, ffmpeg=args.ffmpeg, waveform_cache_dir=cache_dir)
+
+        samples = [measure(lambda: run_engine(engine, args.input, output_file)) for _ in range(args.runs)]
+        results.append(summarize("black", 30, samples))
+
+        for fps in args.fps:
+            cold = []
+            for _ in range(args.runs):
+                shutil.rmtree(cache_dir, ignore_errors=True)
+                cold.append(measure(lambda: run_engine(engine, args.input, output_file,
+                                                       visualizer=True, visualizer_fps=fps)))
+            results.append(summarize("visualizer_cold", fps, cold))
+            warm = [measure(lambda: run_engine(engine, args.input, output_file,
+                                               visualizer=True, visualizer_fps=fps))
+                    for _ in range(args.runs)]
+            results.append(summarize("visualizer_warm", fps, warm))
+
+        if not args.no_showwaves:
+            samples = [measure(lambda: run_showwaves(args.ffmpeg, args.input, output_file))
+                       for _ in range(args.runs)]
+            results.append(summarize("showwaves_30fps", 30, samples))
+
+    black_cpu = results[0]["cpu_s"]
+    for row in results:
+        row["cpu_vs_black"] = row["cpu_s"] / black_cpu if black_cpu else None
+        print(f"{row['mode']:>16} {row['fps']:>3} fps  total={row['wall_s']:.2f}s  "
+              f"CPU={row['cpu_s']:.2f}s  (x{row['cpu_vs_black']:.2f} frente a negro)  fallidos={row['failed']}")
+
+    if args.output:
+        with open(args.output, 'a') as f:
+            f.write(json.dumps({
+                "benchmark": "visualizer",
+                "date": datetime.datetime.now().strftime("%Y-%m-%d %H:%M"),
+                "input": os.path.basename(args.input),
+                "results": results
+            }) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Prueba de carga del servicio HTTP de conversión (job_server.py).
+
+Lanza muchos clientes simultáneos que envían trabajos, siguen su progreso por
+server-sent events y reintentan cuando el servicio responde 503 por
+contrapresión.
+
+Uso:
+    python job_server.py --port 8765 -j 4 --max-queue 32 &
+    python benchmarks/load_test_server.py --input /ruta/audio.mp3 --clients 50 --jobs-per-client 4
+"""
+import sys
+import json
+import time
+import argparse
+import datetime
+import statistics
+import threading
+import http.client
+from urllib.parse import urlsplit
+
+
+def follow_events(host, port, job_id):
+    # Leer el flujo SSE hasta el evento "done" y devolver su contenido
+    connection = http.client.HTTPConnection(host, port, timeout=600)
+    connection.request("GET", f"/jobs/{job_id}/events")
+    response = connection.getresponse()
+    event = None
+    for raw_line in response:
+        line = raw_line.decode().rstrip("\n")
+        if line.startswith("event: "):
+            event = line[7:]
+        elif line.startswith("data: ") and event == "done":
+            connection.close()
+            return json.loads(line[6:])
+    connection.close()
+    return None
+
+
+def submit(host, port, input_file, stats):
+    # Devuelve (estado, datos); los errores de conexión se propagan
+    body = json.dumps({"input": input_file})
+    while True:
+        connection = http.client.HTTPConnection(host, port, timeout=60)
+        try:
+            connection.request("POST", "/jobs", body, {"Content-Type": "application/json"})
+            response = connection.getresponse()
+            data = json.loads(response.read() or b"{}")
+        finally:
+            connection.close()
+        if response.status != 503:
+            return response.status, data
+        with stats["lock"]:
+            stats["rejected"] += 1
+        time.sleep(float(response.getheader("Retry-After", "1")))
+
+
+def client(host, port, input_file, jobs, stats):
+    for _ in range(jobs):
+        start = time.perf_counter()
+        # Un RST o una respuesta cortada cuenta aparte: el informe debe sumar
+        # todos los trabajos enviados
+        try:
+            status, data = submit(host, port, input_file, stats)
+            if status == 202:
+                result = follow_events(host, port, data["id"])
+        except (OSError, http.client.HTTPException):
+            with stats["lock"]:
+                stats["connection_errors"] += 1
+            continue
+        if status != 202:
+            with stats["lock"]:
+                stats["errors"] += 1
+            continue
+        latency = time.perf_counter() - start
+        with stats["lock"]:
+            stats["latencies"].append(latency)
+            if result and result["state"] == "done":
+                stats["completed"] += 1
+            else:
+                stats["failed"] += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8765")
+    parser.add_argument("--input", required=True, help="Archivo de audio accesible por el servicio")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--jobs-per-client", type=int, default=2)
+    parser.add_argument("--output", help="Archivo JSON Lines donde añadir los resultados")
+    args = parser.parse_args()
+
+    url = urlsplit(args.url)
+    stats = {"lock": threading.Lock(), "latencies": [], "completed": 0, "failed": 0,
+             "errors": 0, "connection_errors": 0, "rejected": 0}
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(url.hostname, url.port, args.input,
+                                                      args.jobs_per_client, stats))
+               for _ in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    latencies = sorted(stats["latencies"])
+    result = {
+        "clients": args.clients,
+        "jobs": args.clients * args.jobs_per_client,
+        "completed": stats["completed"],
+        "failed": stats["failed"],
+        "errors": stats["errors"],
+        "connection_errors": stats["connection_errors"],
+        "rejected_503": stats["rejected"],
+        "wall_s": wall,
+        "jobs_per_s": stats["completed"] / wall if wall else 0,
+        "latency_p50_s": statistics.median(latencies) if latencies else None,
+        "latency_p95_s": latencies[int(len(latencies) * 0.95) - 1] if latencies else None
+    }
+    print(json.dumps(result, indent=2))
+
+    if args.output:
+        with open(args.output, 'a') as f:
+            f.write(json.dumps({
+                "benchmark": "job_server_load",
+                "date": datetime.datetime.now().strftime("%Y-%m-%d %H:%M"),
+                "results": [result]
+            }) + "\n")
+    return 0 if stats["failed"] == stats["errors"] == stats["connection_errors"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
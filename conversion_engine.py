@@ -0,0 +1,1124 @@
+"""Motor de conversión asíncrono de Audio Converter Pro.
+
+Un único bucle de asyncio controla todos los procesos de FFmpeg en curso, de
+modo que el número de hilos del sistema no crece con el número de trabajos.
+El mismo motor se usa desde la interfaz gráfica (a través de ConversionThread)
+y en modo sin interfaz:
+
+    python conversion_engine.py cancion1.mp3 cancion2.flac -o salida -j 4
+"""
+import os
+import re
+import sys
+import time
+import bisect
+import asyncio
+import argparse
+import itertools
+import threading
+
+import conversion_history
+from dedup import plan_batch, link_output
+from staging import StagingArea
+import visualizer
+import loudness
+import silence_trim
+import processes
+from verification import OutputVerifier
+import io_scheduler
+from io_scheduler import DeviceScheduler
+import library_scan
+from eta import SpeedModel, makespan, remaining_seconds, format_duration
+
+DEFAULT_OUTPUT_FOLDER = os.path.join(os.path.expanduser("~"), "AudioConverterPro_Output")
+
+# Nombre de entrada/salida que indica la entrada o salida estándar
+PIPE_PATH = "-"
+
+# Fragmentos autocontenidos: el MP4 se puede escribir en un pipe sin volver atrás
+FRAGMENTED_MP4_FLAGS = 'frag_keyframe+empty_moov+default_base_moof'
+
+# Valor de progreso que indica que la duración es desconocida
+PROGRESS_UNKNOWN = -1
+
+# Segundos sin avanzar tras los que un trabajo se considera bloqueado
+DEFAULT_STALL_TIMEOUT = 180
+
+# Espera tras matar un FFmpeg bloqueado antes de abandonarlo y liberar su hueco
+STALL_KILL_GRACE = 5
+
+# Calidad del audio recodificado al normalizar la sonoridad
+NORMALIZED_AUDIO_BITRATE = f"{loudness.OUTPUT_BITRATE // 1000}k"
+
+# FFmpeg separa las actualizaciones de progreso con '\r' y los mensajes con '\n'
+_LINE_SPLIT = re.compile(rb'[\r\n]')
+_TIME_RE = re.compile(r'time=(\S+)')
+
+
+def time_to_seconds(time_str):
+    # Convertir "HH:MM:SS.xx" (o "MM:SS.xx") en segundos
+    try:
+        parts = time_str.split(':')
+        if len(parts) == 3:
+            h, m, s = parts
+            return int(h) * 3600 + int(m) * 60 + float(s.split('.')[0])
+        elif len(parts) == 2:
+            m, s = parts
+            return int(m) * 60 + float(s.split('.')[0])
+        return float(time_str)
+    except:
+        return 0
+
+
+_pidfd_watcher = None
+
+
+def _use_pidfd_child_watcher(loop):
+    # En Linux con Python < 3.12 asyncio vigila cada proceso hijo con un hilo
+    # propio; con pidfd todos los procesos se vigilan desde el bucle de eventos.
+    # El vigilante se asocia al bucle activo, por lo que se asume un único bucle
+    # con conversiones en curso por proceso.
+    global _pidfd_watcher
+    if _pidfd_watcher is None:
+        if sys.platform != 'linux' or sys.version_info >= (3, 12):
+            _pidfd_watcher = False
+        elif not hasattr(asyncio, 'PidfdChildWatcher'):
+            _pidfd_watcher = False
+        else:
+            try:
+                os.close(os.pidfd_open(os.getpid()))
+                _pidfd_watcher = asyncio.PidfdChildWatcher()
+                asyncio.set_child_watcher(_pidfd_watcher)
+            except (AttributeError, OSError):
+                _pidfd_watcher = False
+    if _pidfd_watcher and _pidfd_watcher._loop is not loop:
+        _pidfd_watcher.attach_loop(loop)
+
+
+async def read_lines(stream, chunk_size=4096):
+    # Leer un flujo de FFmpeg línea a línea aceptando '\r' como separador
+    buffer = b""
+    while True:
+        chunk = await stream.read(chunk_size)
+        if not chunk:
+            break
+        buffer += chunk
+        *lines, buffer = _LINE_SPLIT.split(buffer)
+        for line in lines:
+            if line:
+                yield line.decode(errors='replace')
+    if buffer:
+        yield buffer.decode(errors='replace')
+
+
+# Salidas predefinidas: nombre -> resolución (None para solo audio)
+TARGET_PRESETS = {
+    "480p": (854, 480),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "audio": None,
+}
+
+
+class OutputTarget:
+    """Una salida de un trabajo; todas las salidas comparten una sola lectura de la entrada"""
+
+    def __init__(self, output_file, width=1280, height=720, audio_only=False):
+        self.output_file = output_file
+        self.width = width
+        self.height = height
+        self.audio_only = audio_only
+
+        # Ruta local cuando el motor tiene zona de preparación
+        self.write_path = None
+
+        # Resultado propio de esta salida
+        self.success = None
+        self.size = None
+
+    def __repr__(self):
+        kind = "audio" if self.audio_only else f"{self.width}x{self.height}"
+        return f"<OutputTarget {kind} {self.output_file}>"
+
+
+def targets_for(input_file, output_folder, names, root=None):
+    # Crear las salidas de un archivo a partir de nombres de TARGET_PRESETS
+    base = os.path.join(output_folder_for(input_file, output_folder, root),
+                        os.path.splitext(os.path.basename(input_file))[0])
+    targets = []
+    for name in names:
+        size = TARGET_PRESETS[name]
+        if size is None:
+            targets.append(OutputTarget(base + ".m4a", audio_only=True))
+        else:
+            targets.append(OutputTarget(f"{base}_{name}.mp4", *size))
+    return targets
+
+
+class ConversionJob:
+    """Trabajo de conversión de un archivo de audio a MP4"""
+    _ids = itertools.count(1)
+
+    def __init__(self, input_file, output_file=None, preset="ultrafast", use_hwaccel=True,
+                 on_progress=None, on_log=None, on_finished=None,
+                 stdin=None, stdout=None, input_format=None, targets=None,
+                 input_options=None, metadata_file=None, duration=None,
+                 visualizer=False, visualizer_fps=visualizer.DEFAULT_FPS, loudness_target=None,
+                 trim_silence=False):
+        self.id = next(self._ids)
+        self.input_file = input_file
+        # Sin salidas explícitas, una única salida MP4 de 1280x720
+        self.targets = targets or [OutputTarget(output_file)]
+        self.preset = preset
+        self.use_hwaccel = use_hwaccel
+
+        # Modo streaming: con input_file/output_file igual a PIPE_PATH, FFmpeg
+        # lee de stdin y escribe en stdout directamente, sin pasar por Python
+        self.stdin = stdin
+        self.stdout = stdout
+        self.input_format = input_format
+
+        # Opciones extra antes de -i (p. ej. '-safe 0' para listas concat) y
+        # archivo FFMETADATA opcional con metadatos y capítulos de la salida
+        self.input_options = input_options or []
+        self.metadata_file = metadata_file
+
+        # Vídeo de forma de onda a pocos fotogramas por segundo en lugar de negro
+        self.visualizer = visualizer
+        self.visualizer_fps = visualizer_fps
+        self.visualizer_frame = None
+
+        # Normalización de sonoridad a loudness_target LUFS (None la desactiva):
+        # loudness_measurement es la medida en caché y _loudness_values la que
+        # se obtiene durante la conversión cuando aún no hay ninguna
+        self.loudness_target = loudness_target
+        self.loudness_measurement = None
+        self._loudness_values = None
+
+        # Recorte del silencio de los bordes: trim es (inicio, duración o None)
+        # una vez analizada la entrada, y se mantiene en los reintentos
+        self.trim_silence = trim_silence
+        self.trim = None
+
+        # Ruta local de la entrada cuando el motor tiene zona de preparación
+        self.read_path = None
+
+        # Callbacks opcionales; se invocan desde el hilo del bucle del motor
+        self.on_progress = on_progress
+        self.on_log = on_log
+        self.on_finished = on_finished
+
+        # Estado: pending, running, verifying, done, failed o cancelled
+        self.state = "pending"
+        self.success = None
+        self.message = ""
+        self.progress = 0
+        # Duración conocida de antemano; si es None se consulta con ffprobe
+        self.duration = duration
+        # Segundos de conversión previstos según el historial (eta.SpeedModel)
+        self.estimated_seconds = None
+        self.processed_seconds = 0
+        self.returncode = None
+        self.started_at = None
+        self.finished_at = None
+        self.is_cancelled = False
+        # Ejecuciones de FFmpeg realizadas (más de una si hubo reintentos)
+        self.attempts = 0
+        # Vigilancia de bloqueos: último avance y si el vigilante detuvo el trabajo
+        self.last_activity = None
+        self.stalled = False
+        self.quarantined = False
+
+        self._process = None
+        self._slot = None
+        self._task = None
+        # Datos del planificador por dispositivo (io_scheduler)
+        self._io_paths = None
+        self._io_concurrency = {}
+        self._io_started = None
+
+    @property
+    def output_file(self):
+        # Salida principal (la primera)
+        return self.targets[0].output_file
+
+    @output_file.setter
+    def output_file(self, value):
+        self.targets[0].output_file = value
+
+    @property
+    def is_streaming(self):
+        return self.input_file == PIPE_PATH or self.output_file == PIPE_PATH
+
+    def touch(self):
+        # Registrar avance para el vigilante de bloqueos (seguro desde otros hilos)
+        self.last_activity = time.monotonic()
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def __repr__(self):
+        return f"<ConversionJob {self.id} {os.path.basename(self.input_file)} {self.state}>"
+
+
+class ConversionEngine:
+    """Ejecuta trabajos de conversión con un límite de procesos simultáneos"""
+
+    def __init__(self, max_concurrent=None, ffmpeg="ffmpeg", ffprobe="ffprobe", staging=None,
+                 waveform_cache_dir=visualizer.DEFAULT_CACHE_FOLDER, verify_outputs=True, max_retries=1,
+                 io_aware=True, stall_timeout=DEFAULT_STALL_TIMEOUT, longest_first=True,
+                 loudness_cache_file=loudness.DEFAULT_CACHE_FILE,
+                 probe_cache_file=silence_trim.DEFAULT_CACHE_FILE):
+        self.cpu_count = os.cpu_count() or 4
+        # Por defecto, como la opción -j: la mitad de los núcleos
+        self.max_concurrent = max_concurrent or max(1, self.cpu_count // 2)
+        self.ffmpeg = ffmpeg
+        self.ffprobe = ffprobe
+        # StagingArea opcional para trabajar en un disco local rápido
+        self.staging = staging
+        # Fondos y formas de onda ya calculados para el modo visualizador
+        self.waveforms = visualizer.WaveformCache(waveform_cache_dir, ffmpeg)
+        # Medidas de sonoridad de las entradas ya convertidas con normalización
+        self.loudness = loudness.LoudnessCache(loudness_cache_file)
+        # Duración y bordes sin silencio de las entradas ya analizadas
+        self.probes = silence_trim.ProbeCache(probe_cache_file)
+        # Verificación de las salidas con ffprobe y reintentos si falla
+        self.verifier = OutputVerifier(ffprobe) if verify_outputs else None
+        self.max_retries = max_retries
+        # Límite adaptativo de trabajos por dispositivo de almacenamiento
+        self.io = DeviceScheduler(self.max_concurrent) if io_aware else None
+        # Vigilante de trabajos sin progreso (None lo desactiva) y trabajos
+        # retirados tras bloquearse en todos sus intentos
+        self.stall_timeout = stall_timeout
+        self.quarantined = []
+        # Orden de la cola: primero los trabajos más largos según el historial
+        self.longest_first = longest_first
+        self.speed_model = SpeedModel()
+
+        self._pending = []
+        self._pending_keys = []
+        self._sequence = itertools.count()
+        self._running = set()
+        self._loop = None
+        self._thread = None
+        self._watchdog = None
+        self._dispatch_scheduled = False
+        # Esperas de procesos abandonados por el vigilante
+        self._reaping = set()
+
+    # ----- USO DESDE OTROS HILOS -----
+    def start(self):
+        # Lanzar el bucle de eventos en un hilo propio (para la interfaz gráfica)
+        if self._thread:
+            return
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever,
+                                        name="ConversionEngine", daemon=True)
+        self._thread.start()
+
+    def submit(self, job):
+        # Encolar un trabajo desde cualquier hilo; devuelve un concurrent.futures.Future
+        self.start()
+        return asyncio.run_coroutine_threadsafe(self.run_job(job), self._loop)
+
+    def cancel(self, job):
+        # Cancelar un trabajo desde cualquier hilo
+        if self._loop is None:
+            job.is_cancelled = True
+        elif self._in_loop_thread():
+            self._cancel(job)
+        else:
+            self._loop.call_soon_threadsafe(self._cancel, job)
+
+    def set_max_concurrent(self, limit):
+        # Cambiar el número de trabajos simultáneos desde cualquier hilo; si
+        # aumenta, los pendientes arrancan sin esperar a que termine otro
+        self.max_concurrent = max(1, limit)
+        if self._loop is None:
+            return
+        if self._in_loop_thread():
+            self._schedule_dispatch()
+        else:
+            self._loop.call_soon_threadsafe(self._schedule_dispatch)
+
+    def shutdown(self):
+        # Cancelar todos los trabajos y detener el hilo del bucle
+        if not self._thread:
+            return
+        future = asyncio.run_coroutine_threadsafe(self._cancel_all(), self._loop)
+        try:
+            future.result(timeout=10)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=10)
+        self._thread = None
+
+    def _in_loop_thread(self):
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    # ----- USO DESDE EL BUCLE DE EVENTOS -----
+    async def run_job(self, job):
+        # Esperar un hueco libre, ejecutar el trabajo y devolverlo terminado
+        loop = asyncio.get_running_loop()
+        if self._loop is None:
+            self._loop = loop
+        _use_pidfd_child_watcher(loop)
+
+        # Las consultas al disco se hacen antes de entrar en la cola y fuera del
+        # bucle: con una unidad colgada solo espera este trabajo, no el motor
+        located = await loop.run_in_executor(None, self._locate, job)
+        if located is not None:
+            self.io.assign(job, located)
+
+        if job.is_cancelled:
+            self._finish(job, False, "Conversión cancelada por el usuario")
+            return job
+
+        while True:
+            job._slot = loop.create_future()
+            self._enqueue(job)
+            self._schedule_dispatch()
+            try:
+                await job._slot
+            except asyncio.CancelledError:
+                self._finish(job, False, "Conversión cancelada por el usuario")
+                return job
+
+            job.attempts += 1
+            self._start_watchdog()
+            job._task = asyncio.ensure_future(self._execute(job))
+            try:
+                success, message = await job._task
+            except asyncio.CancelledError:
+                # Lo cancela el vigilante (FFmpeg sin respuesta) o el usuario durante
+                # las pasadas previas; cualquier otra cancelación se propaga
+                if not (job.stalled or job.is_cancelled):
+                    raise
+                if job._process is not None and job._process.returncode is None:
+                    # Ya recibió SIGKILL: se recoge en segundo plano cuando el
+                    # kernel lo deje terminar, sin retener el hueco
+                    self._reap_later(job._process)
+                success, message = False, "Conversión cancelada por el usuario"
+            finally:
+                self._running.discard(job)
+                if self.io:
+                    self.io.release(job)
+                self._dispatch()
+
+            if job.stalled:
+                message = f"Sin progreso durante {self.stall_timeout} s"
+                if job.attempts <= self.max_retries and not job.is_cancelled:
+                    self._log(job, f"{message}. Reintentando ({job.attempts}/{self.max_retries})")
+                    self._reset_for_retry(job)
+                    continue
+                # Se retira para que no vuelva a ocupar un hueco
+                job.quarantined = True
+                self.quarantined.append(job)
+                message = f"En cuarentena: {message.lower()}"
+                self._log(job, message)
+
+            # La verificación tiene su propio límite y no ocupa un hueco de conversión
+            if success and self.verifier and not job.is_streaming and not job.is_cancelled:
+                job.state = "verifying"
+                verified, problem = await self.verifier.verify(job)
+                if verified is None:
+                    self._log(job, f"Salida sin verificar: {problem}")
+                elif verified:
+                    self._log(job, "Salida verificada")
+                else:
+                    success = False
+                    message = f"Verificación fallida: {problem}"
+                    self._log(job, message)
+                    if job.attempts <= self.max_retries and not job.is_cancelled:
+                        self._log(job, f"Reintentando la conversión ({job.attempts}/{self.max_retries})")
+                        self._reset_for_retry(job)
+                        continue
+
+            self._finish(job, success, message)
+            return job
+
+    async def run_all(self, jobs):
+        # Ejecutar una lista de trabajos y esperar a que terminen todos
+        return await asyncio.gather(*(self.run_job(job) for job in jobs))
+
+    def _schedule_dispatch(self):
+        # Repartir en la siguiente vuelta del bucle: los trabajos enviados a la
+        # vez (p. ej. con run_all) se ordenan todos antes de lanzar el primero
+        if not self._dispatch_scheduled:
+            self._dispatch_scheduled = True
+            asyncio.get_running_loop().call_soon(self._dispatch)
+
+    def _dispatch(self):
+        # Dar hueco a los trabajos pendientes mientras quede capacidad; un
+        # trabajo cuyo dispositivo está al límite no bloquea a los siguientes
+        self._dispatch_scheduled = False
+        if self.io:
+            self.io.set_max_limit(self.max_concurrent)
+        while self._pending and len(self._running) < self.max_concurrent:
+            job = self._next_job()
+            if job is None:
+                break
+            self._remove_pending(job)
+            self._running.add(job)
+            if self.io:
+                self.io.acquire(job)
+            job._slot.set_result(None)
+
+        # Lectura anticipada: preparar en local los próximos trabajos de la cola
+        if self.staging:
+            for job in self._pending[:self.staging.read_ahead]:
+                if not job.is_streaming:
+                    self.staging.prefetch(job)
+
+    # ----- VIGILANCIA DE BLOQUEOS -----
+    def _start_watchdog(self):
+        if self.stall_timeout and (self._watchdog is None or self._watchdog.done()):
+            self._watchdog = asyncio.ensure_future(self._watch_stalls())
+
+    async def _watch_stalls(self):
+        # Revisar periódicamente los trabajos en curso mientras haya alguno
+        interval = min(5, self.stall_timeout / 4)
+        while self._running or self._pending:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            for job in list(self._running):
+                # En streaming la espera puede ser del otro extremo del pipe
+                if job.stalled or job.is_streaming or job.last_activity is None:
+                    continue
+                if now - job.last_activity > self.stall_timeout:
+                    self._stop_stalled(job)
+
+    def _reap_later(self, process):
+        task = asyncio.ensure_future(process.wait())
+        self._reaping.add(task)
+        task.add_done_callback(self._reaping.discard)
+
+    def _stop_stalled(self, job):
+        job.stalled = True
+        self._log(job, f"Sin progreso durante {self.stall_timeout} s: deteniendo FFmpeg")
+        task = job._task
+        if job._process and job._process.returncode is None:
+            job._process.kill()
+            # Un proceso bloqueado en el kernel (p. ej. una unidad de red caída)
+            # puede no terminar: se abandona tras un margen para liberar el hueco
+            self._loop.call_later(STALL_KILL_GRACE, lambda: task.done() or task.cancel())
+        else:
+            # Bloqueado sin FFmpeg en marcha (copia a disco local, ffprobe, forma
+            # de onda...): la cancelación mata los procesos auxiliares
+            task.cancel()
+
+    # ----- ORDEN DE LA COLA -----
+    def _locate(self, job):
+        # Estimación de duración y dispositivos del trabajo; lee el tamaño y
+        # hace os.stat de sus rutas, por eso se ejecuta fuera del bucle
+        if job.estimated_seconds is None and not job.is_streaming:
+            job.estimated_seconds = self.speed_model.predict(job.input_file, job.duration)
+        if self.io and job._io_paths is None:
+            return io_scheduler.locate(job)
+        return None
+
+    def _enqueue(self, job):
+        # Cola ordenada de mayor a menor duración prevista (LPT) y, a igualdad,
+        # por orden de llegada; así un archivo de 3 horas no empieza el último
+        priority = -(job.estimated_seconds or 0) if self.longest_first else 0
+        key = (priority, next(self._sequence))
+        index = bisect.bisect(self._pending_keys, key)
+        self._pending_keys.insert(index, key)
+        self._pending.insert(index, job)
+
+    def _remove_pending(self, job):
+        index = self._pending.index(job)
+        del self._pending[index]
+        del self._pending_keys[index]
+
+    def batch_eta(self):
+        """Segundos previstos hasta terminar todos los trabajos en curso y en cola"""
+        running = [remaining_seconds(job) for job in list(self._running)]
+        pending = [job.estimated_seconds or 0 for job in list(self._pending)]
+        return makespan(running, pending, self.max_concurrent)
+
+    def _next_job(self):
+        if not self.io:
+            return self._pending[0]
+        for job in self._pending:
+            if self.io.can_start(job):
+                return job
+        return None
+
+    def _cancel(self, job):
+        job.is_cancelled = True
+        if job in self._pending:
+            self._remove_pending(job)
+            job._slot.cancel()
+        elif job._process and job._process.returncode is None:
+            job._process.terminate()
+        elif job in self._running and job._process is None and job._task:
+            # Aún en las pasadas previas: cancelarlas (matan sus procesos)
+            job._task.cancel()
+
+    async def _cancel_all(self):
+        for job in list(self._pending) + list(self._running):
+            self._cancel(job)
+        while self._running:
+            await asyncio.sleep(0.05)
+
+    # ----- EJECUCIÓN DE FFMPEG -----
+    def threads_per_job(self):
+        # Repartir los núcleos entre los trabajos simultáneos
+        return max(1, self.cpu_count // self.max_concurrent)
+
+    def build_command(self, job):
+        # Configuración básica de FFmpeg
+        cmd = [
+            self.ffmpeg,
+            '-y'  # Sobrescribir archivo de salida sin preguntar
+        ]
+
+        # Añadir aceleración por hardware
+        if job.use_hwaccel:
+            cmd.extend(['-hwaccel', 'auto'])
+
+        # Entrada de audio (archivo o pipe); se lee y demultiplexa una sola vez
+        cmd.extend(job.input_options)
+        cmd.extend(trim_options(job))
+        if job.input_format:
+            cmd.extend(['-f', job.input_format])
+        cmd.extend(['-i', 'pipe:0' if job.input_file == PIPE_PATH else job.read_path or job.input_file])
+
+        # Una sola fuente de vídeo a la mayor resolución pedida; si hay varias
+        # salidas con vídeo se reparte con split y se escala para cada una
+        video_targets = [target for target in job.targets if not target.audio_only]
+        video_labels = {}
+        graphs = []
+        input_count = 1
+        if video_targets:
+            width = max(target.width for target in video_targets)
+            height = max(target.height for target in video_targets)
+            chain = None
+            if job.visualizer_frame:
+                # Imagen de la forma de onda repetida y cursor de reproducción
+                fps = job.visualizer_fps
+                cmd.extend(['-framerate', str(fps), '-i', job.visualizer_frame,
+                            '-f', 'lavfi', '-i', visualizer.playhead_source(height, fps)])
+                chain = (f"[1:v]{visualizer.still_loop(job.duration, fps)}[still];"
+                         f"[still][2:v]{visualizer.playhead_overlay(job.duration)}")
+                input_count += 1
+            else:
+                cmd.extend(['-f', 'lavfi', '-i', f'color=c=black:s={width}x{height}:r=30'])
+            input_count += 1
+
+            if len(video_targets) == 1 and chain is None:
+                video_labels[id(video_targets[0])] = '1:v'
+            elif len(video_targets) == 1:
+                video_labels[id(video_targets[0])] = '[v0]'
+                graphs.append(f"{chain}[v0]")
+            else:
+                graph = f"{chain or '[1:v]'}{',' if chain else ''}split={len(video_targets)}"
+                graph += "".join(f"[s{i}]" for i in range(len(video_targets)))
+                for i, target in enumerate(video_targets):
+                    graph += f";[s{i}]scale={target.width}:{target.height}[v{i}]"
+                    video_labels[id(target)] = f'[v{i}]'
+                graphs.append(graph)
+
+        # Sin normalizar, el audio se copia. Normalizado, el filtro de sonoridad se
+        # aplica una sola vez y asplit reparte el resultado entre las salidas, que
+        # lo recodifican en AAC (cada salida de FFmpeg tiene su propio codificador)
+        audio_labels = {id(target): '0:a' for target in job.targets}
+        audio_options = ['-c:a', 'copy']
+        if job.loudness_target is not None:
+            if job.loudness_measurement is not None:
+                graph = f"[0:a]{loudness.linear_filter(job.loudness_measurement, job.loudness_target)}"
+            else:
+                graph = f"[0:a]{loudness.measuring_filter(job.loudness_target)}"
+            if len(job.targets) > 1:
+                graph += f",asplit={len(job.targets)}"
+            for i, target in enumerate(job.targets):
+                graph += f"[a{i}]"
+                audio_labels[id(target)] = f'[a{i}]'
+            graphs.append(graph)
+            audio_options = ['-c:a', 'aac', '-b:a', NORMALIZED_AUDIO_BITRATE]
+        if graphs:
+            cmd.extend(['-filter_complex', ";".join(graphs)])
+
+        # Metadatos y capítulos como última entrada
+        metadata_input = None
+        if job.metadata_file:
+            metadata_input = input_count
+            cmd.extend(['-f', 'ffmetadata', '-i', job.metadata_file])
+
+        for target in job.targets:
+            if metadata_input is not None:
+                cmd.extend(['-map_metadata', str(metadata_input), '-map_chapters', str(metadata_input)])
+            if target.audio_only:
+                # Forzar el muxer mp4: el de .m4a (ipod) no acepta, por ejemplo, MP3
+                cmd.extend(['-map', audio_labels[id(target)], *audio_options, '-f', 'mp4'])
+            else:
+                # Configuración de vídeo optimizada
+                cmd.extend([
+                    '-map', video_labels[id(target)],
+                    '-map', audio_labels[id(target)],
+                    '-shortest',
+                    *audio_options,
+                    '-c:v', 'libx264',
+                    '-preset', job.preset,
+                    '-tune', 'fastdecode',  # Optimizar para decodificación rápida
+                    '-pix_fmt', 'yuv420p',
+                    '-threads', str(self.threads_per_job())
+                ])
+
+            if target.output_file == PIPE_PATH:
+                cmd.extend(['-f', 'mp4', '-movflags', FRAGMENTED_MP4_FLAGS, 'pipe:1'])
+            else:
+                cmd.append(target.write_path or target.output_file)
+        return cmd
+
+    async def probe_duration(self, file_path):
+        try:
+            process = await asyncio.create_subprocess_exec(
+                self.ffprobe, '-v', 'error', '-show_entries', 'format=duration',
+                '-of', 'default=noprint_wrappers=1:nokey=1', file_path,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+            stdout, _ = await processes.communicate(process)
+            return float(stdout.decode().strip())
+        except Exception:
+            return None
+
+    async def _execute(self, job):
+        # Ejecutar FFmpeg una vez; devuelve (éxito, mensaje) sin terminar el trabajo
+        job.state = "running"
+        if job.started_at is None:
+            job.started_at = time.time()
+        # El vigilante cuenta desde aquí: cada fase previa (copia local, silencio,
+        # forma de onda) avisa de su avance, y una que no avance se detiene
+        job.touch()
+        # La zona de preparación puede cambiarse desde la configuración mientras tanto
+        staging = self.staging
+        try:
+            if staging and not job.is_streaming and await staging.stage(job, on_progress=job.touch):
+                self._log(job, f"Entrada preparada en disco local: {job.read_path}")
+            job.touch()
+            if job.trim_silence and job.trim is None:
+                await self._prepare_trim(job)
+                job.touch()
+            if job.visualizer:
+                await self._prepare_visualizer(job)
+                job.touch()
+            if job.loudness_target is not None:
+                await self._prepare_loudness(job)
+            cmd = self.build_command(job)
+
+            input_name = "entrada estándar" if job.input_file == PIPE_PATH else os.path.basename(job.input_file)
+            self._log(job, f"Iniciando conversión de {input_name}")
+            self._log(job, f"Usando preset: {job.preset} con {self.threads_per_job()} threads")
+
+            job._process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=job.stdin if job.input_file == PIPE_PATH else asyncio.subprocess.DEVNULL,
+                stdout=job.stdout if job.output_file == PIPE_PATH else asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE
+            )
+            job.touch()
+            if job.is_cancelled:
+                job._process.terminate()
+
+            # Con duración desconocida (p. ej. un pipe) el progreso es indeterminado
+            duration = job.duration
+            if duration is None and job.input_file != PIPE_PATH:
+                duration = await self.probe_duration(job.input_file)
+            if not duration or duration <= 0:
+                self._log(job, "Duración desconocida: se mostrará el tiempo procesado")
+                duration = None
+                self._progress(job, PROGRESS_UNKNOWN)
+            job.duration = duration
+
+            job.touch()
+            line_count = 0
+            async for line in read_lines(job._process.stderr):
+                line_count += 1
+
+                # Reducir la frecuencia de actualizaciones del log para mejor rendimiento
+                if line_count % 30 == 0:
+                    self._log(job, line.strip())
+
+                if job._loudness_values is not None:
+                    loudness.parse_line(line, job._loudness_values)
+
+                time_match = _TIME_RE.search(line)
+                if time_match:
+                    processed = time_to_seconds(time_match.group(1))
+                    if processed > job.processed_seconds:
+                        job.touch()
+                    job.processed_seconds = processed
+                    if duration:
+                        self._progress(job, min(int(job.processed_seconds / duration * 100), 100))
+
+            job.returncode = await job._process.wait()
+
+            if job.is_cancelled:
+                self._log(job, "Conversión cancelada")
+                return False, "Conversión cancelada por el usuario"
+            elif job.returncode == 0:
+                loop = asyncio.get_running_loop()
+                failed = await loop.run_in_executor(None, self._check_targets, job)
+                values = job._loudness_values
+                if values and job.input_file != PIPE_PATH:
+                    # Las siguientes conversiones de esta entrada usarán ganancia lineal
+                    await loop.run_in_executor(None, self.loudness.put, job.input_file, values)
+                    measured = f"{values['i']:.1f} LUFS" if values.get("i") is not None else "silencio"
+                    self._log(job, f"Sonoridad medida: {measured}")
+                if any(target.write_path for target in job.targets):
+                    self._log(job, "Copiando la salida a su destino...")
+                    await staging.finalize(job, on_progress=job.touch)
+                self._progress(job, 100)
+                for target in job.targets:
+                    if target.output_file == PIPE_PATH:
+                        self._log(job, f"Transmisión completada: {job.processed_seconds:.0f} segundos de audio")
+                    elif target.success:
+                        self._log(job, f"Archivo guardado en: {target.output_file}")
+                if failed:
+                    error_msg = "Salidas no generadas: " + ", ".join(
+                        os.path.basename(target.output_file) for target in failed)
+                    self._log(job, error_msg)
+                    return False, error_msg
+                return True, "Conversión exitosa"
+            else:
+                error_msg = f"Error en la conversión. Código: {job.returncode}"
+                self._log(job, error_msg)
+                return False, error_msg
+
+        except asyncio.CancelledError:
+            # Cancelado por el usuario, el vigilante o el cierre del bucle: no
+            # dejar FFmpeg en marcha (los procesos auxiliares ya se mataron)
+            if job._process and job._process.returncode is None:
+                job._process.kill()
+            raise
+        except Exception as e:
+            if job._process and job._process.returncode is None:
+                job._process.kill()
+            self._log(job, f"Error crítico: {str(e)}")
+            return False, str(e)
+
+    async def _prepare_visualizer(self, job):
+        # La forma de onda necesita la duración y una pasada previa por el audio
+        video_targets = [target for target in job.targets if not target.audio_only]
+        if job.input_file == PIPE_PATH or not video_targets:
+            self._log(job, "Visualizador no disponible para esta entrada: se usa fondo negro")
+            return
+        if job.duration is None:
+            job.duration = await self.probe_duration(job.read_path or job.input_file)
+        if not job.duration:
+            self._log(job, "Duración desconocida: el visualizador no está disponible, se usa fondo negro")
+            return
+        width = max(target.width for target in video_targets)
+        height = max(target.height for target in video_targets)
+        input_options = list(job.input_options) + trim_options(job)
+        if job.input_format:
+            input_options += ['-f', job.input_format]
+        try:
+            job.visualizer_frame = await self.waveforms.frame(job.input_file, width, height,
+                                                              input_options, job.read_path, on_progress=job.touch)
+            self._log(job, f"Visualizador a {job.visualizer_fps} fps")
+        except (OSError, RuntimeError) as e:
+            self._log(job, f"{e}; se usa fondo negro")
+
+    async def _prepare_trim(self, job):
+        # Bordes sin silencio, de la caché o de un análisis rápido de los extremos
+        if job.input_file == PIPE_PATH or job.input_format == "concat":
+            self._log(job, "Recorte de silencio no disponible para esta entrada")
+            job.trim = (0.0, None)
+            return
+        loop = asyncio.get_running_loop()
+        info = await loop.run_in_executor(None, self.probes.get, job.input_file)
+        if info is None or info.get("version") != silence_trim.CACHE_VERSION:
+            path = job.read_path or job.input_file
+            duration = job.duration or await self.probe_duration(path)
+            if not duration:
+                self._log(job, "Duración desconocida: no se recorta el silencio")
+                job.trim = (0.0, None)
+                return
+            self._log(job, "Buscando silencio al principio y al final...")
+            try:
+                start, end = await silence_trim.find_boundaries(self.ffmpeg, path, duration,
+                                                                job.input_options, on_progress=job.touch)
+            except (OSError, RuntimeError) as e:
+                self._log(job, f"{e}; no se recorta el silencio")
+                job.trim = (0.0, None)
+                return
+            info = {"duration": duration, "start": start, "end": end,
+                    "version": silence_trim.CACHE_VERSION}
+            await loop.run_in_executor(None, self.probes.put, job.input_file, info)
+
+        duration, start, end = info["duration"], info["start"], info["end"]
+        if start <= 0 and end >= duration:
+            job.trim = (0.0, None)
+            job.duration = duration
+            return
+        job.trim = (start, end - start)
+        job.duration = end - start
+        self._log(job, f"Silencio recortado: {start:.1f} s al principio y {duration - end:.1f} s al final")
+
+    async def _prepare_loudness(self, job):
+        # Con medida en caché basta una ganancia lineal; si no, se mide en esta conversión
+        if job.input_file != PIPE_PATH:
+            job.loudness_measurement = await asyncio.get_running_loop().run_in_executor(
+                None, self.loudness.get, job.input_file)
+        if job.loudness_measurement is not None:
+            job._loudness_values = None
+            gain = loudness.linear_gain(job.loudness_measurement, job.loudness_target)
+            self._log(job, f"Normalización a {job.loudness_target:g} LUFS: ganancia de {gain:+.1f} dB")
+        else:
+            job._loudness_values = {}
+            self._log(job, f"Normalización a {job.loudness_target:g} LUFS midiendo la sonoridad")
+
+    def _check_targets(self, job):
+        # Resultado propio de cada salida: debe existir y no estar vacía
+        failed = []
+        for target in job.targets:
+            if target.output_file == PIPE_PATH:
+                target.success = True
+                continue
+            try:
+                target.size = os.path.getsize(target.write_path or target.output_file)
+                target.success = target.size > 0
+            except OSError:
+                target.success = False
+            if not target.success:
+                failed.append(target)
+        return failed
+
+    # ----- NOTIFICACIONES -----
+    def _log(self, job, message):
+        if job.on_log:
+            job.on_log(message)
+
+    def _progress(self, job, value):
+        if value != job.progress:
+            job.progress = value
+            if job.on_progress:
+                job.on_progress(value)
+
+    def _reset_for_retry(self, job):
+        # Volver a la cola como un trabajo nuevo, conservando la duración ya medida
+        if self.staging:
+            self.staging.discard(job)
+        for target in job.targets:
+            target.success = None
+            target.size = None
+        job.state = "pending"
+        job.returncode = None
+        job.processed_seconds = 0
+        job.last_activity = None
+        job.stalled = False
+        job._process = None
+        self._progress(job, 0)
+
+    def _finish(self, job, success, message):
+        if self.staging:
+            self.staging.discard(job)
+        job.success = success
+        job.message = message
+        job.finished_at = time.time()
+        if success:
+            job.state = "done"
+        elif job.is_cancelled:
+            job.state = "cancelled"
+        else:
+            job.state = "failed"
+        job._process = None
+        if job.on_finished:
+            job.on_finished(job)
+
+
+def trim_options(job):
+    # Opciones de entrada que saltan el silencio inicial y limitan la duración
+    if not job.trim:
+        return []
+    start, length = job.trim
+    options = ['-ss', f"{start:.3f}"] if start else []
+    if length:
+        options.extend(['-t', f"{length:.3f}"])
+    return options
+
+
+def staging_from_args(args):
+    if not args.scratch_dir:
+        return None
+    max_bytes = int(args.scratch_max_gb * 1024 ** 3) if args.scratch_max_gb else None
+    return StagingArea(args.scratch_dir, max_bytes=max_bytes, read_ahead=args.read_ahead)
+
+
+def stream(args):
+    # Pipe a pipe: FFmpeg hereda stdin y stdout, así que la memoria no depende
+    # de la duración de la entrada. Los mensajes van a stderr.
+    job = ConversionJob(
+        PIPE_PATH, PIPE_PATH, preset=args.preset, use_hwaccel=not args.no_hwaccel,
+        stdin=sys.stdin.buffer, stdout=sys.stdout.buffer, input_format=args.input_format,
+        loudness_target=args.normalize,
+        on_log=lambda message: print(message, file=sys.stderr)
+    )
+    engine = ConversionEngine(max_concurrent=1)
+    asyncio.run(engine.run_job(job))
+    return 0 if job.success else 1
+
+
+_default_engine = None
+
+
+def get_default_engine():
+    # Motor compartido por toda la aplicación
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = ConversionEngine()
+    return _default_engine
+
+
+def output_path_for(input_file, output_folder, root=None):
+    output_name = os.path.splitext(os.path.basename(input_file))[0] + ".mp4"
+    return os.path.join(output_folder_for(input_file, output_folder, root), output_name)
+
+
+def output_folder_for(input_file, output_folder, root=None):
+    # Con root (la carpeta importada) se conserva la ruta relativa a ella: las
+    # pistas con el mismo nombre de álbumes distintos no comparten salida
+    if root is None:
+        return output_folder
+    relative = os.path.relpath(os.path.dirname(os.path.abspath(input_file)), os.path.abspath(root))
+    return output_folder if relative == os.curdir else os.path.join(output_folder, relative)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convierte archivos de audio a MP4 sin interfaz gráfica")
+    parser.add_argument("inputs", nargs="*",
+                        help="Archivos de audio de entrada; las carpetas se recorren de forma recursiva")
+    parser.add_argument("-o", "--output-folder", default=DEFAULT_OUTPUT_FOLDER)
+    parser.add_argument("-j", "--jobs", type=int, default=max(1, (os.cpu_count() or 4) // 2),
+                        help="Número de conversiones simultáneas")
+    parser.add_argument("--preset", default="ultrafast")
+    parser.add_argument("--no-hwaccel", action="store_true")
+    parser.add_argument("--stream", action="store_true",
+                        help="Leer el audio de stdin y escribir MP4 fragmentado en stdout")
+    parser.add_argument("--scratch-dir",
+                        help="Carpeta local rápida donde preparar entradas y salidas (p. ej. un tmpfs)")
+    parser.add_argument("--scratch-max-gb", type=float,
+                        help="Espacio máximo a ocupar en la carpeta local")
+    parser.add_argument("--read-ahead", type=int, default=2,
+                        help="Entradas de la cola a copiar por adelantado")
+    parser.add_argument("--input-format",
+                        help="Formato de la entrada en modo streaming si FFmpeg no puede detectarlo (mp3, flac...)")
+    parser.add_argument("--targets",
+                        help="Salidas a generar de cada entrada en una sola pasada, separadas por comas "
+                             f"({', '.join(TARGET_PRESETS)}); p. ej. 720p,1080p,audio")
+    parser.add_argument("--visualizer", action="store_true",
+                        help="Vídeo con la forma de onda y un cursor de reproducción en lugar de fondo negro")
+    parser.add_argument("--visualizer-fps", type=int, default=visualizer.DEFAULT_FPS,
+                        help="Fotogramas por segundo del visualizador (más bajo, más rápido)")
+    parser.add_argument("--no-verify", action="store_true",
+                        help="No comprobar los flujos y la duración de las salidas con ffprobe")
+    parser.add_argument("--retries", type=int, default=1,
+                        help="Reintentos de una conversión cuya salida no supera la verificación")
+    parser.add_argument("--no-io-scheduling", action="store_true",
+                        help="No limitar los trabajos simultáneos por dispositivo de almacenamiento")
+    parser.add_argument("--stall-timeout", type=float, default=DEFAULT_STALL_TIMEOUT,
+                        help="Segundos sin progreso tras los que se detiene y reintenta un trabajo (0 lo desactiva)")
+    parser.add_argument("--normalize", type=float, nargs="?", const=loudness.DEFAULT_TARGET, metavar="LUFS",
+                        help="Normalizar la sonoridad del audio (por defecto a "
+                             f"{loudness.DEFAULT_TARGET:g} LUFS); recodifica el audio a AAC")
+    parser.add_argument("--trim-silence", action="store_true",
+                        help="Recortar el silencio del principio y del final de cada entrada")
+    parser.add_argument("--fifo", action="store_true",
+                        help="Convertir en el orden dado en lugar de empezar por los archivos más largos")
+    parser.add_argument("--dedup", action="store_true",
+                        help="Convertir una sola vez las entradas con contenido idéntico y enlazar el resto")
+    args = parser.parse_args(argv)
+
+    target_names = args.targets.split(",") if args.targets else None
+    if target_names and not set(target_names) <= set(TARGET_PRESETS):
+        parser.error(f"salidas válidas: {', '.join(TARGET_PRESETS)}")
+
+    if args.stream:
+        return stream(args)
+    if not args.inputs:
+        parser.error("se requiere al menos un archivo de entrada (o --stream)")
+
+    # Sustituir cada carpeta por los archivos de audio que contiene, recordando
+    # de qué carpeta viene cada uno para reproducir su estructura en la salida
+    inputs = []
+    roots = {}
+    for path in args.inputs:
+        if os.path.isdir(path):
+            for found, _ in library_scan.iter_files([path]):
+                inputs.append(found)
+                roots[found] = path
+        else:
+            inputs.append(path)
+    args.inputs = inputs
+
+    os.makedirs(args.output_folder, exist_ok=True)
+    engine = ConversionEngine(max_concurrent=args.jobs, staging=staging_from_args(args),
+                              verify_outputs=not args.no_verify, max_retries=args.retries,
+                              io_aware=not args.no_io_scheduling,
+                              stall_timeout=args.stall_timeout or None, longest_first=not args.fifo)
+    # Las conversiones anteriores en la misma carpeta de salida mejoran la estimación
+    history = conversion_history.read_history(conversion_history.history_path(args.output_folder))
+    engine.speed_model = SpeedModel.from_history(history)
+
+    if args.dedup:
+        batch = plan_batch(args.inputs)
+        skipped = len(args.inputs) - len(batch)
+        if skipped:
+            print(f"{skipped} entradas duplicadas se enlazarán en lugar de convertirse", file=sys.stderr)
+    else:
+        batch = [(path, []) for path in args.inputs]
+
+    def outputs_for(input_file):
+        # Rutas de salida de una entrada, una por cada salida pedida
+        root = roots.get(input_file)
+        if target_names:
+            return [target.output_file
+                    for target in targets_for(input_file, args.output_folder, target_names, root)]
+        return [output_path_for(input_file, args.output_folder, root)]
+
+    def on_finished(job, duplicates):
+        print(f"{'OK' if job.success else 'ERROR'}\t{job.input_file}\t{job.message}")
+        for duplicate in duplicates:
+            if job.success:
+                # Cada salida del duplicado enlaza con la salida equivalente
+                for target, duplicate_output in zip(job.targets, outputs_for(duplicate)):
+                    link_output(target.output_file, duplicate_output)
+                print(f"OK\t{duplicate}\tDuplicado de {job.input_file}")
+            else:
+                print(f"ERROR\t{duplicate}\t{job.message}")
+
+    def make_job(input_file, duplicates):
+        name = os.path.basename(input_file)
+        root = roots.get(input_file)
+        targets = targets_for(input_file, args.output_folder, target_names, root) if target_names else None
+        os.makedirs(output_folder_for(input_file, args.output_folder, root), exist_ok=True)
+        return ConversionJob(
+            input_file, output_path_for(input_file, args.output_folder, root), targets=targets,
+            preset=args.preset, use_hwaccel=not args.no_hwaccel,
+            visualizer=args.visualizer, visualizer_fps=args.visualizer_fps, loudness_target=args.normalize,
+            trim_silence=args.trim_silence,
+            on_log=lambda message: print(f"[{name}] {message}", file=sys.stderr),
+            on_finished=lambda job: on_finished(job, duplicates)
+        )
+
+    jobs = [make_job(path, duplicates) for path, duplicates in batch]
+    estimates = [engine.speed_model.predict(job.input_file) or 0 for job in jobs]
+    print(f"Tiempo estimado del lote: {format_duration(makespan([], estimates, args.jobs))}", file=sys.stderr)
+    jobs = asyncio.run(engine.run_all(jobs))
+    return 0 if all(job.success for job in jobs) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""Lectura y escritura del historial de conversiones.
+
+El historial es una lista JSON de diccionarios guardada junto a los archivos
+de salida. La escritura es atómica y puede protegerse con un archivo de
+bloqueo para que varios procesos (o varias máquinas en una carpeta
+compartida) añadan entradas al mismo historial.
+"""
+import os
+import json
+import time
+import socket
+import datetime
+import contextlib
+
+HISTORY_FILENAME = "conversion_history.json"
+
+# Un bloqueo más antiguo que esto se considera abandonado por un proceso caído
+STALE_LOCK_SECONDS = 30
+
+
+def history_path(output_folder):
+    return os.path.join(output_folder, HISTORY_FILENAME)
+
+
+def node_name():
+    return socket.gethostname()
+
+
+def read_history(path):
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except:
+        return []
+
+
+def write_history(path, history):
+    # Escribir en un temporal y sustituir para no dejar nunca un JSON a medias
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(history, f)
+    os.replace(temp_path, path)
+
+
+@contextlib.contextmanager
+def locked(path, timeout=60):
+    # Bloqueo entre procesos basado en la creación exclusiva de un archivo
+    lock_path = f"{path}.lock"
+    deadline = time.time() + timeout
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.close(fd)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > STALE_LOCK_SECONDS:
+                    os.remove(lock_path)
+                    continue
+            except OSError:
+                continue
+            if time.time() > deadline:
+                raise TimeoutError(f"No se pudo bloquear {path}")
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        try:
+            os.remove(lock_path)
+        except OSError:
+            pass
+
+
+def append_entries(path, entries):
+    # Añadir entradas releyendo el archivo para no perder las de otros procesos
+    with locked(path):
+        history = read_history(path)
+        history.extend(entries)
+        write_history(path, history)
+
+
+def make_entry(input_file, output_file, success, node=None, elapsed=None, duration=None, size=None):
+    entry = {
+        "date": datetime.datetime.now().strftime("%Y-%m-%d %H:%M"),
+        "input_file": input_file,
+        "output_file": output_file,
+        "format": os.path.splitext(input_file)[1][1:].upper(),
+        "success": success,
+        "node": node or node_name()
+    }
+    # Datos de rendimiento (las entradas antiguas no los tienen)
+    if elapsed is not None:
+        entry["elapsed"] = round(elapsed, 3)
+    if duration is not None:
+        entry["duration"] = round(duration, 3)
+    if size is not None:
+        entry["size"] = size
+    return entry
+
+
+def entry_for_job(job, node=None):
+    # Crear la entrada de historial de un ConversionJob terminado
+    try:
+        size = os.path.getsize(job.input_file)
+    except OSError:
+        size = None
+    return make_entry(job.input_file, job.output_file if job.success else "", bool(job.success),
+                      node=node, elapsed=job.elapsed or None, duration=job.duration, size=size)
+
+
+def node_throughput(history):
+    # Rendimiento por nodo: trabajos, segundos de audio y tiempo de conversión
+    stats = {}
+    for item in history:
+        node = stats.setdefault(item.get("node") or node_name(), {
+            "jobs": 0, "succeeded": 0, "audio_seconds": 0.0, "busy_seconds": 0.0, "bytes": 0
+        })
+        node["jobs"] += 1
+        if item.get("success"):
+            node["succeeded"] += 1
+            node["audio_seconds"] += item.get("duration") or 0
+            node["busy_seconds"] += item.get("elapsed") or 0
+            node["bytes"] += item.get("size") or 0
+    for node in stats.values():
+        # Velocidad media: segundos de audio convertidos por segundo de trabajo
+        node["speed"] = node["audio_seconds"] / node["busy_seconds"] if node["busy_seconds"] else None
+    return stats
@@ -0,0 +1,113 @@
+"""Detección de entradas duplicadas antes de convertir un lote.
+
+Los archivos se comparan por etapas para leer lo mínimo posible:
+
+1. Tamaño (solo stat): un archivo con tamaño único no puede tener copias.
+2. Hash parcial del principio y el final de los archivos con el mismo tamaño.
+3. Hash completo solo cuando los hashes parciales coinciden.
+
+Cada etapa se ejecuta en paralelo en un grupo de hilos, ya que el coste está
+en la E/S (muy alto en unidades de red) y no en la CPU.
+"""
+import os
+import shutil
+import hashlib
+import collections
+import concurrent.futures
+
+PARTIAL_BYTES = 64 * 1024
+CHUNK_BYTES = 1024 * 1024
+DEFAULT_WORKERS = 16
+
+
+def _file_size(path):
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        return None
+
+
+def _partial_hash(path, size):
+    # Hash del primer y el último bloque; suficiente para descartar casi todo
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        digest.update(f.read(PARTIAL_BYTES))
+        if size > 2 * PARTIAL_BYTES:
+            f.seek(-PARTIAL_BYTES, os.SEEK_END)
+            digest.update(f.read(PARTIAL_BYTES))
+    return digest.hexdigest()
+
+
+def _full_hash(path):
+    digest = hashlib.blake2b(digest_size=32)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _regroup(executor, groups, key_function):
+    # Subdividir cada grupo con key_function y quedarse con los que siguen repetidos
+    candidates = [(group_key, path) for group_key, paths in groups.items() for path in paths]
+    keys = executor.map(lambda item: _safe(key_function, item), candidates, chunksize=64)
+    regrouped = collections.defaultdict(list)
+    for (group_key, path), key in zip(candidates, keys):
+        if key is not None:
+            regrouped[(group_key, key)].append(path)
+    return {key: paths for key, paths in regrouped.items() if len(paths) > 1}
+
+
+def _safe(key_function, item):
+    try:
+        return key_function(*item)
+    except OSError:
+        return None
+
+
+def find_duplicates(paths, workers=DEFAULT_WORKERS):
+    """Devuelve grupos de rutas con contenido idéntico, en el orden de entrada"""
+    paths = list(dict.fromkeys(paths))
+    order = {path: index for index, path in enumerate(paths)}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        # Etapa 1: agrupar por tamaño
+        by_size = collections.defaultdict(list)
+        for path, size in zip(paths, executor.map(_file_size, paths, chunksize=256)):
+            if size is not None:
+                by_size[size].append(path)
+        groups = {size: group for size, group in by_size.items() if len(group) > 1}
+
+        # Etapa 2: hash parcial, solo entre archivos del mismo tamaño
+        groups = _regroup(executor, groups, lambda size, path: _partial_hash(path, size))
+
+        # Etapa 3: hash completo, solo en las colisiones reales
+        groups = _regroup(executor, groups, lambda partial_key, path: _full_hash(path))
+
+    return sorted((sorted(group, key=order.get) for group in groups.values()),
+                  key=lambda group: order[group[0]])
+
+
+def plan_batch(paths, workers=DEFAULT_WORKERS):
+    """Separa un lote en archivos a convertir y sus duplicados.
+
+    Devuelve una lista de (ruta, [duplicados]) en el orden de entrada; cada
+    ruta se convierte una sola vez y sus duplicados se enlazan después.
+    """
+    duplicates = {}
+    skipped = set()
+    for group in find_duplicates(paths, workers):
+        duplicates[group[0]] = group[1:]
+        skipped.update(group[1:])
+    return [(path, duplicates.get(path, [])) for path in dict.fromkeys(paths) if path not in skipped]
+
+
+def link_output(source, destination):
+    # Enlace duro si es posible (mismo sistema de archivos); si no, copia
+    if os.path.abspath(source) == os.path.abspath(destination):
+        return
+    os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+    if os.path.lexists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
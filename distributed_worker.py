@@ -0,0 +1,371 @@
+"""Modo trabajador: varias máquinas convierten trabajos de una carpeta compartida.
+
+La cola es una carpeta (NFS/SMB o local) con esta estructura:
+
+    cola/pending/   trabajos esperando (un JSON por trabajo)
+    cola/running/   trabajos reclamados; el propio JSON hace de concesión
+    cola/done/      trabajos terminados con éxito
+    cola/failed/    trabajos fallidos o que agotaron sus intentos
+    cola/output/    carpeta de salida por defecto e historial compartido
+
+Un nodo reclama un trabajo moviéndolo de pending/ a running/ (el renombrado
+es atómico, así que solo un nodo lo consigue) y renueva la concesión
+actualizando la fecha de modificación del archivo. Si un nodo cae, su
+concesión caduca y cualquier otro nodo devuelve el trabajo a pending/.
+
+    python distributed_worker.py submit --queue-dir /mnt/cola audio1.mp3 audio2.flac
+    python distributed_worker.py work --queue-dir /mnt/cola -j 2
+    python distributed_worker.py work --queue-dir /tmp/cola --processes 4   # prueba local
+    python distributed_worker.py status --queue-dir /mnt/cola
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import subprocess
+
+import conversion_history
+from conversion_engine import (ConversionEngine, ConversionJob, TARGET_PRESETS, output_path_for, targets_for,
+                               staging_from_args)
+from dedup import plan_batch, link_output
+
+QUEUE_STATES = ("pending", "running", "done", "failed")
+
+
+async def in_thread(func, *args):
+    # Las operaciones sobre la carpeta compartida pueden bloquear (NFS/SMB)
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+
+class SharedQueue:
+    """Cola de trabajos en una carpeta compartida con concesiones que caducan"""
+
+    def __init__(self, queue_dir, lease_ttl=60, max_attempts=3):
+        self.queue_dir = queue_dir
+        self.lease_ttl = lease_ttl
+        self.max_attempts = max_attempts
+        self.output_folder = os.path.join(queue_dir, "output")
+        self.clock_file = os.path.join(queue_dir, ".clock")
+
+    def path(self, state, name=""):
+        return os.path.join(self.queue_dir, state, name)
+
+    def ensure_layout(self):
+        for state in QUEUE_STATES + ("tmp",):
+            os.makedirs(self.path(state), exist_ok=True)
+        os.makedirs(self.output_folder, exist_ok=True)
+
+    # ----- ESCRITURA ATÓMICA -----
+    def _write(self, path, data):
+        temp_path = self.path("tmp", f"{uuid.uuid4().hex}.json")
+        with open(temp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+
+    def _read(self, path):
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def server_now(self):
+        # Hora del servidor de archivos: las concesiones se comparan con ella
+        # para no depender de que los relojes de los nodos estén sincronizados
+        with open(self.clock_file, 'a'):
+            pass
+        os.utime(self.clock_file)
+        return os.path.getmtime(self.clock_file)
+
+    # ----- OPERACIONES DE LA COLA -----
+    def submit(self, input_file, output_file=None, duplicate_outputs=(), target_names=None,
+               output_folder=None):
+        # duplicate_outputs: por cada entrada duplicada, sus rutas de salida (una
+        # por salida pedida) que se enlazan a las de este trabajo cuando termina.
+        # Con target_names las salidas se crean en output_folder con targets_for
+        name = f"{time.time():.6f}-{uuid.uuid4().hex[:8]}.json"
+        self._write(self.path("pending", name), {
+            "input_file": os.path.abspath(input_file),
+            "output_file": output_file or output_path_for(input_file, self.output_folder),
+            "targets": list(target_names) if target_names else None,
+            "output_folder": output_folder or self.output_folder,
+            "duplicate_outputs": [list(outputs) for outputs in duplicate_outputs],
+            "attempts": 0
+        })
+        return name
+
+    def claim(self, node, token):
+        # Reclamar el trabajo pendiente más antiguo; otro nodo puede ganar la carrera
+        for name in sorted(os.listdir(self.path("pending"))):
+            if not name.endswith(".json"):
+                continue
+            running_path = self.path("running", name)
+            try:
+                os.rename(self.path("pending", name), running_path)
+                os.utime(running_path)  # La concesión empieza ahora
+            except OSError:
+                continue
+            data = self._read(running_path)
+            if data is None:
+                continue
+            data["attempts"] = data.get("attempts", 0) + 1
+            data["lease"] = {"node": node, "pid": os.getpid(), "token": token}
+            self._write(running_path, data)
+            return name, data
+        return None, None
+
+    def heartbeat(self, name, token):
+        # Renovar la concesión; devuelve False si otro nodo la ha recuperado
+        running_path = self.path("running", name)
+        data = self._read(running_path)
+        if not data or data.get("lease", {}).get("token") != token:
+            return False
+        try:
+            os.utime(running_path)
+        except OSError:
+            return False
+        return True
+
+    def complete(self, name, token, success, result):
+        running_path = self.path("running", name)
+        data = self._read(running_path)
+        if not data or data.get("lease", {}).get("token") != token:
+            return False
+        data["result"] = result
+        target = "done" if success else "failed"
+        if not success and data.get("attempts", 0) < self.max_attempts:
+            target = "pending"
+            data.pop("lease", None)
+        self._write(running_path, data)
+        try:
+            os.rename(running_path, self.path(target, name))
+        except OSError:
+            return False
+        return True
+
+    def reclaim_expired(self):
+        # Devolver a pending/ los trabajos cuyos nodos dejaron de renovar la concesión
+        reclaimed = []
+        now = self.server_now()
+        for name in os.listdir(self.path("running")):
+            running_path = self.path("running", name)
+            try:
+                if now - os.path.getmtime(running_path) <= self.lease_ttl:
+                    continue
+                data = self._read(running_path) or {}
+                target = "pending" if data.get("attempts", 0) < self.max_attempts else "failed"
+                os.rename(running_path, self.path(target, name))
+                reclaimed.append(name)
+            except OSError:
+                continue
+        return reclaimed
+
+    def counts(self):
+        return {state: sum(1 for name in os.listdir(self.path(state)) if name.endswith(".json"))
+                for state in QUEUE_STATES}
+
+
+class Worker:
+    """Nodo que reclama trabajos de la cola compartida y los convierte"""
+
+    def __init__(self, queue, node, max_concurrent=1, heartbeat_interval=10, poll_interval=1.0, staging=None):
+        self.queue = queue
+        self.node = node
+        self.engine = ConversionEngine(max_concurrent=max_concurrent, staging=staging)
+        self.heartbeat_interval = heartbeat_interval
+        self.poll_interval = poll_interval
+        self.history_file = conversion_history.history_path(queue.output_folder)
+        self.active = {}
+
+    def log(self, message):
+        print(f"[{self.node}] {message}", file=sys.stderr, flush=True)
+
+    async def run(self, exit_when_idle=False):
+        self.queue.ensure_layout()
+        self.log(f"Esperando trabajos en {self.queue.queue_dir}")
+        tasks = set()
+        while True:
+            for name in await in_thread(self.queue.reclaim_expired):
+                self.log(f"Trabajo recuperado de un nodo caído: {name}")
+
+            claimed = False
+            while len(self.active) < self.engine.max_concurrent:
+                token = uuid.uuid4().hex
+                name, data = await in_thread(self.queue.claim, self.node, token)
+                if not name:
+                    break
+                claimed = True
+                self.active[name] = token
+                task = asyncio.ensure_future(self.process(name, token, data))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            # Al salir cuando no hay trabajo, esperar también a que caduquen
+            # las concesiones de nodos caídos para recuperar sus trabajos
+            if exit_when_idle and not claimed and not self.active:
+                if not (await in_thread(self.queue.counts))["running"]:
+                    break
+            await asyncio.sleep(self.poll_interval)
+        # No abandonar trabajos que aún estén registrando su resultado
+        await asyncio.gather(*tasks)
+
+    async def process(self, name, token, data):
+        # El trabajo sigue activo hasta registrar su resultado: así run no
+        # termina mientras se completa la cola o se escribe el historial
+        try:
+            await self._process(name, token, data)
+        finally:
+            del self.active[name]
+
+    async def _process(self, name, token, data):
+        targets = None
+        if data.get("targets"):
+            targets = targets_for(data["input_file"], data["output_folder"], data["targets"])
+        job = ConversionJob(data["input_file"], data["output_file"], targets=targets)
+        os.makedirs(os.path.dirname(job.output_file) or ".", exist_ok=True)
+        self.log(f"Convirtiendo {data['input_file']} (intento {data['attempts']})")
+        heartbeat = asyncio.ensure_future(self.keep_lease(name, token, job))
+        try:
+            await self.engine.run_job(job)
+        finally:
+            heartbeat.cancel()
+
+        if job.success:
+            for duplicate_outputs in data.get("duplicate_outputs", []):
+                # Los trabajos encolados por versiones anteriores guardan una sola ruta
+                if isinstance(duplicate_outputs, str):
+                    duplicate_outputs = [duplicate_outputs]
+                for target, duplicate_output in zip(job.targets, duplicate_outputs):
+                    await in_thread(link_output, target.output_file, duplicate_output)
+
+        result = {"node": self.node, "success": bool(job.success), "message": job.message,
+                  "elapsed": job.elapsed}
+        if await in_thread(self.queue.complete, name, token, bool(job.success), result):
+            entry = conversion_history.entry_for_job(job, node=self.node)
+            await in_thread(conversion_history.append_entries, self.history_file, [entry])
+            self.log(f"{'Terminado' if job.success else 'Error'}: {data['input_file']} ({job.message})")
+        else:
+            self.log(f"Concesión perdida, resultado descartado: {name}")
+
+    async def keep_lease(self, name, token, job):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            if not await in_thread(self.queue.heartbeat, name, token):
+                # Otro nodo recuperó el trabajo: dejar de convertirlo aquí
+                self.log(f"Concesión perdida, cancelando: {name}")
+                self.engine.cancel(job)
+                return
+
+
+def print_status(queue):
+    counts = queue.counts()
+    print("  ".join(f"{state}={count}" for state, count in counts.items()))
+    history = conversion_history.read_history(conversion_history.history_path(queue.output_folder))
+    for node, stats in sorted(conversion_history.node_throughput(history).items()):
+        speed = f"{stats['speed']:.1f}x" if stats["speed"] else "-"
+        print(f"{node}: {stats['succeeded']}/{stats['jobs']} trabajos, "
+              f"{stats['audio_seconds'] / 60:.1f} min de audio, velocidad {speed}")
+
+
+def spawn_local_workers(args):
+    # Lanzar varios procesos trabajadores en esta máquina (para pruebas)
+    base = args.node_id or conversion_history.node_name()
+    processes = []
+    for index in range(args.processes):
+        cmd = [sys.executable, os.path.abspath(__file__), "work", "--queue-dir", args.queue_dir,
+               "-j", str(args.jobs), "--node-id", f"{base}-{index + 1}",
+               "--lease-ttl", str(args.lease_ttl), "--heartbeat", str(args.heartbeat)]
+        if args.exit_when_idle:
+            cmd.append("--exit-when-idle")
+        if args.scratch_dir:
+            # Cada proceso usa su propia subcarpeta local
+            cmd.extend(["--scratch-dir", os.path.join(args.scratch_dir, f"worker_{index + 1}")])
+            if args.scratch_max_gb:
+                cmd.extend(["--scratch-max-gb", str(args.scratch_max_gb / args.processes)])
+        processes.append(subprocess.Popen(cmd))
+    try:
+        return max(process.wait() for process in processes)
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+        return 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Conversión distribuida mediante una carpeta compartida")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    submit_parser = subparsers.add_parser("submit", help="Añadir archivos a la cola")
+    submit_parser.add_argument("inputs", nargs="+")
+    submit_parser.add_argument("-o", "--output-folder", help="Carpeta de salida (por defecto cola/output)")
+    submit_parser.add_argument("--dedup", action="store_true",
+                               help="Encolar una sola vez las entradas idénticas y enlazar sus salidas")
+    submit_parser.add_argument("--targets",
+                               help="Salidas de cada entrada separadas por comas "
+                                    f"({', '.join(TARGET_PRESETS)})")
+
+    work_parser = subparsers.add_parser("work", help="Procesar trabajos de la cola")
+    work_parser.add_argument("-j", "--jobs", type=int, default=1, help="Conversiones simultáneas por nodo")
+    work_parser.add_argument("--node-id", help="Identificador del nodo (por defecto el nombre del equipo)")
+    work_parser.add_argument("--processes", type=int, default=1,
+                             help="Lanzar varios procesos trabajadores en esta máquina")
+    work_parser.add_argument("--lease-ttl", type=float, default=60,
+                             help="Segundos sin renovar tras los que una concesión caduca")
+    work_parser.add_argument("--heartbeat", type=float, default=10,
+                             help="Segundos entre renovaciones de la concesión")
+    work_parser.add_argument("--exit-when-idle", action="store_true",
+                             help="Terminar cuando no queden trabajos pendientes")
+    work_parser.add_argument("--scratch-dir",
+                             help="Carpeta local donde preparar entradas y salidas de la carpeta compartida")
+    work_parser.add_argument("--scratch-max-gb", type=float)
+    work_parser.add_argument("--read-ahead", type=int, default=2)
+
+    subparsers.add_parser("status", help="Mostrar el estado de la cola y el rendimiento por nodo")
+
+    for subparser in subparsers.choices.values():
+        subparser.add_argument("--queue-dir", required=True)
+    args = parser.parse_args(argv)
+
+    queue = SharedQueue(args.queue_dir, lease_ttl=getattr(args, "lease_ttl", 60))
+    queue.ensure_layout()
+
+    if args.command == "submit":
+        output_folder = args.output_folder or queue.output_folder
+        target_names = args.targets.split(",") if args.targets else None
+        if target_names and not set(target_names) <= set(TARGET_PRESETS):
+            parser.error(f"salidas válidas: {', '.join(TARGET_PRESETS)}")
+
+        def outputs_for(input_file):
+            if target_names:
+                return [target.output_file for target in targets_for(input_file, output_folder, target_names)]
+            return [output_path_for(input_file, output_folder)]
+
+        batch = plan_batch(args.inputs) if args.dedup else [(path, []) for path in args.inputs]
+        for input_file, duplicates in batch:
+            print(queue.submit(input_file, outputs_for(input_file)[0],
+                               [outputs_for(duplicate) for duplicate in duplicates],
+                               target_names=target_names, output_folder=output_folder))
+        return 0
+
+    if args.command == "status":
+        print_status(queue)
+        return 0
+
+    if args.processes > 1:
+        return spawn_local_workers(args)
+
+    worker = Worker(queue, args.node_id or conversion_history.node_name(),
+                    max_concurrent=args.jobs, heartbeat_interval=args.heartbeat,
+                    staging=staging_from_args(args))
+    try:
+        asyncio.run(worker.run(exit_when_idle=args.exit_when_idle))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""Predicción del tiempo de conversión a partir del historial.
+
+Cada entrada del historial guarda la duración del audio, el tamaño de la
+entrada y el tiempo que tardó la conversión. Con ellas se calcula, por
+formato, la velocidad (segundos de audio convertidos por segundo) y los bytes
+por segundo de audio, de modo que se puede estimar cuánto tardará un archivo
+de la cola sin analizarlo con ffprobe: basta con su tamaño.
+
+El tiempo total del lote se estima como el reparto "el más largo primero"
+(LPT) de los trabajos entre los huecos del motor, que es también el orden en
+que el motor los lanza.
+"""
+import os
+import heapq
+import collections
+
+# Valores por defecto sin historial: vídeo negro a 720p con preset ultrafast
+# y audio comprimido a unos 128 kbit/s
+DEFAULT_SPEED = 10.0
+DEFAULT_BYTES_PER_AUDIO_SECOND = 16000
+
+# Mínimo de segundos de audio registrados para fiarse de un formato concreto
+MIN_AUDIO_SECONDS = 60
+
+
+class SpeedModel:
+    """Velocidad de conversión por formato aprendida del historial"""
+
+    def __init__(self):
+        # formato (o None para el total) -> [audio_seconds, busy_seconds, bytes, audio_seconds_with_size]
+        self._stats = collections.defaultdict(lambda: [0.0, 0.0, 0, 0.0])
+
+    @classmethod
+    def from_history(cls, history):
+        model = cls()
+        for entry in history:
+            model.add(entry)
+        return model
+
+    def add(self, entry):
+        # Solo sirven las conversiones correctas con datos de rendimiento
+        duration = entry.get("duration")
+        elapsed = entry.get("elapsed")
+        if not entry.get("success") or not duration or not elapsed:
+            return
+        size = entry.get("size") or 0
+        for key in (entry.get("format") or "", None):
+            stats = self._stats[key]
+            stats[0] += duration
+            stats[1] += elapsed
+            if size:
+                stats[2] += size
+                stats[3] += duration
+
+    def _reliable(self, file_format, index):
+        # Estadística del formato si tiene datos suficientes; si no, la global
+        for key in (file_format, None):
+            stats = self._stats.get(key)
+            if stats and stats[index] >= MIN_AUDIO_SECONDS:
+                return stats
+        return None
+
+    def speed(self, file_format):
+        stats = self._reliable(file_format, 0)
+        return stats[0] / stats[1] if stats and stats[1] else DEFAULT_SPEED
+
+    def bytes_per_audio_second(self, file_format):
+        stats = self._reliable(file_format, 3)
+        return stats[2] / stats[3] if stats and stats[3] else DEFAULT_BYTES_PER_AUDIO_SECOND
+
+    def predict(self, input_file, duration=None, size=None):
+        """Segundos estimados de conversión, o None si no hay datos de la entrada"""
+        file_format = os.path.splitext(input_file)[1][1:].upper()
+        if not duration:
+            if size is None:
+                try:
+                    size = os.path.getsize(input_file)
+                except (OSError, ValueError):
+                    return None
+            duration = size / self.bytes_per_audio_second(file_format)
+        return duration / self.speed(file_format)
+
+
+def makespan(running_remaining, pending, workers):
+    # Reparto LPT: cada trabajo, de mayor a menor, va al hueco que antes se libera
+    loads = sorted(running_remaining)[-workers:] if workers else []
+    loads += [0.0] * (workers - len(loads))
+    heapq.heapify(loads)
+    for seconds in sorted(pending, reverse=True):
+        heapq.heappush(loads, heapq.heappop(loads) + seconds)
+    return max(loads) if loads else 0.0
+
+
+def remaining_seconds(job):
+    # Tiempo restante de un trabajo en curso: por su progreso o por la estimación
+    if job.progress and job.progress > 5 and job.elapsed:
+        return job.elapsed * (100 - job.progress) / job.progress
+    if job.estimated_seconds:
+        return max(0.0, job.estimated_seconds - job.elapsed)
+    return 0.0
+
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600} h {seconds % 3600 // 60:02d} min"
+    if seconds >= 60:
+        return f"{seconds // 60} min {seconds % 60:02d} s"
+    return f"{seconds} s"
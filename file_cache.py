@@ -0,0 +1,98 @@
+"""Caché en JSON de datos calculados a partir de archivos de entrada.
+
+Cada entrada se guarda con la ruta, el tamaño y la fecha de modificación del
+archivo, así que deja de valer en cuanto el archivo cambia. El JSON se lee una
+sola vez y las entradas nuevas se escriben por lotes, como mucho cada
+SAVE_INTERVAL segundos y al salir del programa. Varias instancias del programa
+pueden compartir el mismo JSON: al guardar se relee y se mezclan las entradas
+de los demás procesos antes de reemplazarlo de forma atómica.
+
+get y put hacen un os.stat de la entrada: desde el bucle de eventos del motor
+se llaman en un hilo aparte.
+"""
+import os
+import json
+import time
+import atexit
+import threading
+
+SAVE_INTERVAL = 5
+
+
+class FileCache:
+    """Datos por archivo de entrada, guardados en un JSON"""
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = None
+        self._dirty = {}
+        self._last_save = 0.0
+        self._timer = None
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def _key(self, input_file):
+        # Los datos dejan de valer si el archivo cambia de tamaño o de fecha
+        try:
+            stat = os.stat(input_file)
+        except (OSError, ValueError):
+            return None
+        return f"{os.path.abspath(input_file)}|{stat.st_size}|{stat.st_mtime_ns}"
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, input_file):
+        key = self._key(input_file)
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._read()
+            return self._entries.get(key) if key else None
+
+    def put(self, input_file, value):
+        key = self._key(input_file)
+        if key is None:
+            return
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._read()
+            self._entries[key] = value
+            self._dirty[key] = value
+            wait = self._last_save + SAVE_INTERVAL - time.monotonic()
+            if wait > 0:
+                # Agrupar con las entradas que lleguen hasta entonces
+                if self._timer is None:
+                    self._timer = threading.Timer(wait, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+            self._save()
+
+    def flush(self):
+        # Escribir las entradas pendientes
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._dirty:
+                self._save()
+
+    def _save(self):
+        # Releer para conservar los datos de otros procesos; se llama con el cerrojo
+        entries = self._read()
+        entries.update(self._dirty)
+        self._entries = entries
+        self._dirty = {}
+        self._last_save = time.monotonic()
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(entries, f)
+            os.replace(temp_path, self.path)
+        except OSError:
+            pass
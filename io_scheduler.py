@@ -0,0 +1,205 @@
+"""Límite adaptativo de trabajos simultáneos por dispositivo de almacenamiento.
+
+Con muchas conversiones leyendo del mismo disco mecánico o escribiendo en la
+misma unidad de red, el rendimiento total cae aunque la CPU esté libre. Cada
+entrada y salida se asocia a su dispositivo (st_dev) y, al terminar cada
+trabajo, se mide el caudal conseguido. El límite de cada dispositivo sube
+mientras añadir un trabajo más aumenta el caudal total y baja cuando lo
+reduce, de forma independiente para cada dispositivo: los trabajos en un NVMe
+no esperan detrás de los que están en un disco lento.
+"""
+import os
+import time
+import asyncio
+
+# Peso de cada nueva medida en la media móvil exponencial del caudal
+EWMA_WEIGHT = 0.3
+
+# Subir el límite si un trabajo más mejora el caudal al menos un 5 %;
+# bajarlo si con el límite actual el caudal es un 10 % peor que con uno menos
+GAIN_THRESHOLD = 0.05
+DROP_THRESHOLD = 0.10
+
+# Límite inicial para discos mecánicos y unidades de red
+SLOW_DEVICE_INITIAL_LIMIT = 2
+
+NETWORK_FILESYSTEMS = {"nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "fuse.sshfs", "afs", "ceph", "glusterfs"}
+
+
+def _read_text(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _mount_types():
+    # major:minor -> tipo de sistema de archivos (solo Linux)
+    types = {}
+    text = _read_text("/proc/self/mountinfo")
+    for line in (text or "").splitlines():
+        fields = line.split()
+        if " - " in line and len(fields) > 2:
+            types[fields[2]] = line.split(" - ", 1)[1].split()[0]
+    return types
+
+
+class Device:
+    """Estado de un dispositivo: trabajos en curso, límite y caudal medido"""
+
+    def __init__(self, dev, limit, kind):
+        self.dev = dev
+        self.kind = kind
+        self.limit = limit
+        self.running = 0
+        # Caudal total medido (bytes/s, media móvil) según los trabajos simultáneos
+        self.throughput = {}
+
+    @property
+    def name(self):
+        return f"{os.major(self.dev)}:{os.minor(self.dev)}"
+
+    def record(self, concurrency, bytes_per_second):
+        # Caudal total estimado: el del trabajo por los que compartían el dispositivo
+        total = bytes_per_second * concurrency
+        previous = self.throughput.get(concurrency)
+        self.throughput[concurrency] = total if previous is None else \
+            previous + EWMA_WEIGHT * (total - previous)
+
+    def adapt(self, max_limit):
+        current = self.throughput.get(self.limit)
+        lower = self.throughput.get(self.limit - 1)
+        higher = self.throughput.get(self.limit + 1)
+        if current is None:
+            return
+        if lower is not None and current < lower * (1 - DROP_THRESHOLD):
+            self.limit -= 1
+        elif self.limit < max_limit and (higher is None or higher >= current * (1 + GAIN_THRESHOLD)):
+            # Probar un trabajo más mientras no se sepa que empeora
+            self.limit += 1
+
+    def __repr__(self):
+        return f"<Device {self.name} {self.kind} {self.running}/{self.limit}>"
+
+
+class DeviceScheduler:
+    """Reparte los huecos del motor respetando el límite de cada dispositivo"""
+
+    def __init__(self, max_limit):
+        self.max_limit = max_limit
+        self.devices = {}
+        self._mount_types = None
+
+    # ----- IDENTIFICACIÓN -----
+    def _kind(self, dev):
+        # rotational (disco mecánico), network, solid o unknown
+        major, minor = os.major(dev), os.minor(dev)
+        rotational = _read_text(f"/sys/dev/block/{major}:{minor}/queue/rotational")
+        if rotational is None:
+            # Las particiones heredan la cola del disco que las contiene
+            rotational = _read_text(f"/sys/dev/block/{major}:{minor}/../queue/rotational")
+        if rotational is not None:
+            return "rotational" if rotational == "1" else "solid"
+        if self._mount_types is None:
+            self._mount_types = _mount_types()
+        if self._mount_types.get(f"{major}:{minor}") in NETWORK_FILESYSTEMS:
+            return "network"
+        return "unknown"
+
+    def _initial_limit(self, kind):
+        limit = SLOW_DEVICE_INITIAL_LIMIT if kind in ("rotational", "network") else self.max_limit
+        return min(limit, self.max_limit)
+
+    def _device(self, dev):
+        device = self.devices.get(dev)
+        if device is None:
+            kind = self._kind(dev)
+            device = self.devices[dev] = Device(dev, self._initial_limit(kind), kind)
+        return device
+
+    def set_max_limit(self, max_limit):
+        # Ajustar los dispositivos ya vistos al nuevo límite del motor: al
+        # subirlo parten al menos de su límite inicial, al bajarlo no lo superan
+        if max_limit == self.max_limit:
+            return
+        self.max_limit = max_limit
+        for device in self.devices.values():
+            device.limit = min(max(device.limit, self._initial_limit(device.kind)), max_limit)
+
+    def assign(self, job, located):
+        # Asociar al trabajo los dispositivos que devolvió locate()
+        job._io_paths = {}
+        for dev, path in located:
+            job._io_paths.setdefault(self._device(dev), []).append(path)
+
+    def devices_for(self, job):
+        # Sin assign() (p. ej. solo pipes) el trabajo no ocupa ningún dispositivo
+        return list(job._io_paths or ())
+
+    # ----- REPARTO -----
+    def can_start(self, job):
+        return all(device.running < device.limit for device in self.devices_for(job))
+
+    def acquire(self, job):
+        devices = self.devices_for(job)
+        for device in devices:
+            device.running += 1
+        job._io_concurrency = {device: device.running for device in devices}
+        job._io_started = time.monotonic()
+
+    def release(self, job):
+        # Medir el caudal del trabajo y ajustar el límite de sus dispositivos
+        if job._io_started is None:
+            return
+        elapsed = time.monotonic() - job._io_started
+        job._io_started = None
+        for device in job._io_concurrency:
+            device.running -= 1
+        if job.returncode != 0 or elapsed <= 0:
+            return
+        # Los tamaños se leen fuera del bucle de eventos: una unidad de red
+        # colgada solo retrasa la medida, no el reparto de los demás trabajos
+        samples = [(device, concurrency, job._io_paths[device])
+                   for device, concurrency in job._io_concurrency.items()]
+        sizes = asyncio.get_running_loop().run_in_executor(
+            None, lambda: [_total_size(paths) for _, _, paths in samples])
+        sizes.add_done_callback(lambda future: self._record(samples, future, elapsed))
+
+    def _record(self, samples, future, elapsed):
+        if future.cancelled() or future.exception():
+            return
+        for (device, concurrency, _), transferred in zip(samples, future.result()):
+            if transferred:
+                device.record(concurrency, transferred / elapsed)
+                device.adapt(self.max_limit)
+
+
+def locate(job):
+    """Lista de (st_dev, ruta) de la entrada y de la carpeta de cada salida.
+
+    Hace un os.stat por ruta, que puede bloquearse con una unidad de red
+    caída: el motor la llama fuera del bucle de eventos.
+    """
+    # Las rutas "-" son pipes y no ocupan ningún dispositivo
+    paths = [(job.input_file, job.input_file)] if job.input_file != "-" else []
+    paths += [(os.path.dirname(os.path.abspath(target.output_file)), target.output_file)
+              for target in job.targets if target.output_file != "-"]
+    located = []
+    for location, path in paths:
+        try:
+            located.append((os.stat(location).st_dev, path))
+        except (OSError, ValueError):
+            continue
+    return located
+
+
+def _total_size(paths):
+    # Bytes leídos (entrada) o escritos (salidas) en un dispositivo
+    total = 0
+    for path in paths:
+        try:
+            total += os.path.getsize(path)
+        except (OSError, ValueError):
+            pass
+    return total
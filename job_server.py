@@ -0,0 +1,389 @@
+"""Servicio HTTP local para enviar conversiones a Audio Converter Pro.
+
+Solo usa la biblioteca estándar. Los trabajos se ejecutan en el mismo motor de
+conversión que usa la interfaz gráfica y el progreso de cada uno se publica
+como server-sent events.
+
+    python job_server.py --port 8765 -j 4 --max-queue 64
+
+Rutas:
+    POST   /jobs                 JSON {"input": "/ruta/audio.mp3"} o el audio en
+                                 el cuerpo con ?filename=audio.mp3; opcionalmente
+                                 varias salidas de una sola pasada con
+                                 "targets": ["720p", "audio"] o ?targets=720p,audio
+    GET    /jobs                 Lista de trabajos
+    GET    /jobs/<id>            Estado de un trabajo
+    GET    /jobs/<id>/events     Progreso en formato text/event-stream
+    GET    /jobs/<id>/output     Descarga del MP4 generado
+    DELETE /jobs/<id>            Cancelar un trabajo
+"""
+import os
+import re
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import threading
+import collections
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from conversion_engine import (ConversionEngine, ConversionJob, output_path_for, targets_for,
+                               TARGET_PRESETS, DEFAULT_OUTPUT_FOLDER)
+
+_JOB_PATH = re.compile(r'^/jobs/(\d+)(/events|/output)?$')
+_COPY_BUFFER = 1024 * 1024
+
+# Cuerpo máximo que se lee y descarta antes de una respuesta de error. Cerrar
+# el socket con datos sin leer hace que Linux envíe un RST y el cliente recibe
+# un ConnectionResetError en lugar del 503; más allá de este límite se cierra
+_DRAIN_LIMIT = 16 * 1024 * 1024
+
+
+class JobRecord:
+    """Trabajo enviado al servicio junto con su registro de eventos"""
+
+    def __init__(self, job, uploaded=False):
+        self.job = job
+        self.uploaded = uploaded
+        self.events = []
+        self.condition = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.job.state in ("done", "failed", "cancelled")
+
+    def publish(self, event, data):
+        # Se llama desde el hilo del motor; despierta a los clientes SSE
+        with self.condition:
+            self.events.append((event, data))
+            self.condition.notify_all()
+
+    def to_dict(self):
+        job = self.job
+        return {
+            "id": job.id,
+            "input": job.input_file,
+            "output": job.output_file if job.success else None,
+            "state": job.state,
+            "progress": job.progress,
+            "message": job.message,
+            "elapsed": round(job.elapsed, 3),
+            "targets": [{"output": target.output_file, "success": target.success, "size": target.size}
+                        for target in job.targets]
+        }
+
+
+class JobServer(ThreadingHTTPServer):
+    """Servidor HTTP con el registro de trabajos y el motor de conversión"""
+    daemon_threads = True
+    # Cola de conexiones pendientes de accept(): con la de 5 por defecto, una
+    # ráfaga de clientes simultáneos recibe RST antes de llegar al 503
+    request_queue_size = 128
+
+    def __init__(self, address, engine, output_folder, upload_folder,
+                 max_queue=64, max_upload_bytes=2 * 1024 ** 3, keep_finished=1000, input_root=None,
+                 verbose=False):
+        super().__init__(address, JobRequestHandler)
+        self.engine = engine
+        self.output_folder = output_folder
+        self.upload_folder = upload_folder
+        self.max_queue = max_queue
+        self.max_upload_bytes = max_upload_bytes
+        self.keep_finished = keep_finished
+        self.input_root = os.path.realpath(input_root) if input_root else None
+        self.verbose = verbose
+
+        self.records = collections.OrderedDict()
+        self.lock = threading.Lock()
+        # Huecos reservados por peticiones que aún están leyendo su cuerpo
+        self.reserved = 0
+
+    def active_count(self):
+        return sum(1 for record in self.records.values() if not record.finished)
+
+    def reserve_slot(self):
+        # Control de contrapresión: rechazar si la cola está llena. El hueco
+        # queda reservado hasta release_slot para que las subidas simultáneas
+        # no pasen todas la comprobación antes de registrarse
+        with self.lock:
+            if self.active_count() + self.reserved >= self.max_queue:
+                return False
+            self.reserved += 1
+            return True
+
+    def release_slot(self):
+        with self.lock:
+            self.reserved -= 1
+
+    def submit(self, input_file, uploaded=False, target_names=None):
+        targets = targets_for(input_file, self.output_folder, target_names) if target_names else None
+        job = ConversionJob(input_file, output_path_for(input_file, self.output_folder), targets=targets)
+        # Dos trabajos del mismo archivo, o de archivos con el mismo nombre,
+        # pueden estar en curso a la vez: el id evita que pisen sus salidas
+        for target in job.targets:
+            target.output_file = os.path.join(self.output_folder,
+                                              f"{job.id}_{os.path.basename(target.output_file)}")
+        record = JobRecord(job, uploaded)
+        job.on_progress = lambda value: record.publish(
+            "progress", {"progress": value, "time": job.processed_seconds})
+        job.on_log = lambda message: record.publish("log", {"message": message})
+        job.on_finished = lambda job: self._job_finished(record)
+
+        with self.lock:
+            self.records[job.id] = record
+            self._forget_old_records()
+        self.engine.submit(job)
+        return record
+
+    def _job_finished(self, record):
+        if record.uploaded:
+            shutil.rmtree(os.path.dirname(record.job.input_file), ignore_errors=True)
+        record.publish("done", record.to_dict())
+
+    def _forget_old_records(self):
+        finished = [job_id for job_id, record in self.records.items() if record.finished]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self.records[job_id]
+
+    def get(self, job_id):
+        with self.lock:
+            return self.records.get(job_id)
+
+    def input_allowed(self, path):
+        if not self.input_root:
+            return True
+        real_path = os.path.realpath(path)
+        return os.path.commonpath([real_path, self.input_root]) == self.input_root
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    server_version = "AudioConverterPro"
+    protocol_version = "HTTP/1.1"
+
+    # ----- RUTAS -----
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == "/jobs":
+            with self.server.lock:
+                jobs = [record.to_dict() for record in self.server.records.values()]
+            return self.send_json(200, {"jobs": jobs})
+
+        record, suffix = self.find_record(path)
+        if record is None:
+            return
+        if suffix == "/events":
+            return self.stream_events(record)
+        if suffix == "/output":
+            return self.send_output(record)
+        self.send_json(200, record.to_dict())
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != "/jobs":
+            self.discard_body()
+            return self.send_json(404, {"error": "Ruta no encontrada"})
+        if not self.server.reserve_slot():
+            self.discard_body()
+            return self.send_json(503, {"error": "Cola llena"}, {"Retry-After": "5"})
+
+        # La reserva se libera tanto si el trabajo se registró (ya cuenta como
+        # activo) como si la petición se rechazó o el cuerpo llegó incompleto
+        try:
+            content_type = self.headers.get("Content-Type", "").split(";")[0].strip()
+            query = parse_qs(url.query)
+            target_names = query["targets"][0].split(",") if "targets" in query else None
+            if content_type == "application/json":
+                return self.submit_path()
+            if not self.valid_targets(target_names):
+                self.discard_body()
+                return
+            self.submit_upload(query.get("filename", ["audio"])[0], target_names)
+        finally:
+            self.server.release_slot()
+
+    def do_DELETE(self):
+        record, suffix = self.find_record(urlsplit(self.path).path)
+        if record is None:
+            return
+        self.server.engine.cancel(record.job)
+        self.send_json(202, record.to_dict())
+
+    # ----- ENVÍO DE TRABAJOS -----
+    def submit_path(self):
+        try:
+            body = json.loads(self.rfile.read(self.content_length()) or b"{}")
+            input_file = body["input"]
+            target_names = body.get("targets")
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return self.send_json(400, {"error": "Se esperaba {\"input\": \"ruta\"}"})
+
+        if not self.valid_targets(target_names):
+            return
+        if not os.path.isfile(input_file) or not self.server.input_allowed(input_file):
+            return self.send_json(400, {"error": f"Archivo no disponible: {input_file}"})
+        self.send_created(self.server.submit(input_file, target_names=target_names))
+
+    def valid_targets(self, target_names):
+        # Las salidas pedidas deben existir en TARGET_PRESETS
+        if target_names is None or (isinstance(target_names, list) and target_names
+                                    and set(target_names) <= set(TARGET_PRESETS)):
+            return True
+        self.send_json(400, {"error": f"Salidas válidas: {', '.join(TARGET_PRESETS)}"})
+        return False
+
+    def submit_upload(self, filename, target_names=None):
+        length = self.content_length()
+        if length <= 0:
+            return self.send_json(411, {"error": "Se requiere Content-Length"})
+        if length > self.server.max_upload_bytes:
+            self.discard_body()
+            return self.send_json(413, {"error": "Archivo demasiado grande"})
+
+        # Copiar el cuerpo por bloques para no cargarlo entero en memoria
+        name = os.path.basename(filename) or "audio"
+        upload_dir = tempfile.mkdtemp(dir=self.server.upload_folder)
+        input_file = os.path.join(upload_dir, name)
+        remaining = length
+        with open(input_file, 'wb') as f:
+            while remaining > 0:
+                chunk = self.rfile.read(min(_COPY_BUFFER, remaining))
+                if not chunk:
+                    break
+                f.write(chunk)
+                remaining -= len(chunk)
+        if remaining:
+            shutil.rmtree(upload_dir, ignore_errors=True)
+            self.close_connection = True
+            return self.send_json(400, {"error": "Cuerpo incompleto"})
+
+        self.send_created(self.server.submit(input_file, uploaded=True, target_names=target_names))
+
+    def send_created(self, record):
+        job_id = record.job.id
+        self.send_json(202, dict(record.to_dict(), events=f"/jobs/{job_id}/events"),
+                       {"Location": f"/jobs/{job_id}"})
+
+    # ----- RESPUESTAS -----
+    def stream_events(self, record):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        sent = 0
+        try:
+            while True:
+                # El evento "done" es siempre el último que se publica
+                with record.condition:
+                    if sent == len(record.events):
+                        record.condition.wait(timeout=15)
+                    events = record.events[sent:]
+                sent += len(events)
+
+                if not events:
+                    self.wfile.write(b": keep-alive\n\n")
+                for event, data in events:
+                    self.wfile.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode())
+                self.wfile.flush()
+                if events and events[-1][0] == "done":
+                    break
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def send_output(self, record):
+        job = record.job
+        if not job.success or not os.path.exists(job.output_file):
+            return self.send_json(409, {"error": "El trabajo no ha generado salida", "state": job.state})
+        self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(os.path.getsize(job.output_file)))
+        self.end_headers()
+        with open(job.output_file, 'rb') as f:
+            shutil.copyfileobj(f, self.wfile, _COPY_BUFFER)
+
+    def send_json(self, status, data, headers=None):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    # ----- AUXILIARES -----
+    def find_record(self, path):
+        match = _JOB_PATH.match(path)
+        record = self.server.get(int(match.group(1))) if match else None
+        if record is None:
+            self.send_json(404, {"error": "Trabajo no encontrado"})
+            return None, None
+        return record, match.group(2)
+
+    def content_length(self):
+        try:
+            return int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            return 0
+
+    def discard_body(self):
+        # Leer y descartar el cuerpo (hasta _DRAIN_LIMIT) antes de responder;
+        # si es más largo, la conexión no puede reutilizarse
+        length = self.content_length()
+        remaining = min(length, _DRAIN_LIMIT)
+        while remaining > 0:
+            chunk = self.rfile.read(min(_COPY_BUFFER, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+        if remaining or length > _DRAIN_LIMIT:
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio HTTP local de conversión de audio a MP4")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="Interfaz de escucha (0.0.0.0 para aceptar trabajos de la red local)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("-o", "--output-folder", default=DEFAULT_OUTPUT_FOLDER)
+    parser.add_argument("-j", "--jobs", type=int, default=max(1, (os.cpu_count() or 4) // 2),
+                        help="Número de conversiones simultáneas")
+    parser.add_argument("--max-queue", type=int, default=64,
+                        help="Trabajos sin terminar admitidos antes de responder 503")
+    parser.add_argument("--max-upload-mb", type=int, default=2048)
+    parser.add_argument("--input-root", help="Solo aceptar rutas de entrada dentro de esta carpeta")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output_folder, exist_ok=True)
+    upload_folder = os.path.join(args.output_folder, ".uploads")
+    os.makedirs(upload_folder, exist_ok=True)
+
+    engine = ConversionEngine(max_concurrent=args.jobs)
+    engine.start()
+    server = JobServer(
+        (args.host, args.port), engine, args.output_folder, upload_folder,
+        max_queue=args.max_queue, max_upload_bytes=args.max_upload_mb * 1024 * 1024,
+        input_root=args.input_root, verbose=args.verbose
+    )
+    print(f"Servicio de conversión escuchando en http://{args.host}:{server.server_port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        engine.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
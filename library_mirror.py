@@ -0,0 +1,262 @@
+"""Espejo incremental de una biblioteca de audio en una biblioteca de MP4.
+
+Recrea la estructura de carpetas del origen dentro de la carpeta de salida. Un
+índice JSON guardado en la carpeta de salida registra, por cada archivo de
+origen, su tamaño, su fecha de modificación y el estado de su salida. Cada
+ejecución convierte solo los archivos nuevos o modificados y borra las salidas
+cuyo original ya no existe; si no hay cambios, solo se recorre el árbol de
+origen, sin abrir ni analizar ningún archivo.
+
+    python library_mirror.py /musica -o /videos -j 4
+    python library_mirror.py /musica -o /videos --dry-run
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+import conversion_history
+import library_scan
+import loudness
+from conversion_engine import ConversionEngine, ConversionJob, DEFAULT_OUTPUT_FOLDER
+from eta import SpeedModel
+
+INDEX_FILENAME = ".audio_converter_mirror.json"
+INDEX_VERSION = 1
+
+# Con muchos cambios, el índice se guarda durante la conversión como mucho
+# cada 30 segundos: una sincronización interrumpida no repite lo ya hecho
+SAVE_INTERVAL = 30
+
+
+class SyncPlan:
+    """Cambios entre el árbol de origen y el índice"""
+
+    def __init__(self):
+        self.convert = []     # (ruta relativa, ruta absoluta, os.stat_result, salida relativa)
+        self.orphans = []     # rutas relativas de origen que ya no existen
+        self.unchanged = 0
+        self.unreadable = []  # carpetas de origen que no se pudieron leer
+
+    def __repr__(self):
+        return (f"<SyncPlan convertir={len(self.convert)} huérfanos={len(self.orphans)} "
+                f"sin cambios={self.unchanged}>")
+
+
+class MirrorIndex:
+    """Estado del espejo: un registro por archivo de origen"""
+
+    def __init__(self, source_root, output_folder):
+        self.source_root = os.path.abspath(source_root)
+        self.output_folder = os.path.abspath(output_folder)
+        self.path = os.path.join(self.output_folder, INDEX_FILENAME)
+        # ruta relativa del origen -> {"size", "mtime_ns", "output", "state"}
+        self.files = {}
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return self
+        if data.get("version") == INDEX_VERSION:
+            self.files = data.get("files", {})
+        return self
+
+    def save(self):
+        # Escritura atómica: un corte durante la sincronización no corrompe el índice
+        os.makedirs(self.output_folder, exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({"version": INDEX_VERSION, "source": self.source_root, "files": self.files}, f)
+        os.replace(temp_path, self.path)
+
+    # ----- PLANIFICACIÓN -----
+    def plan(self, extensions=library_scan.AUDIO_EXTENSIONS):
+        plan = SyncPlan()
+        existing = self._existing_outputs() if self.files else set()
+        taken = {record["output"] for record in self.files.values()}
+        seen = set()
+
+        # Las rutas de scandir empiezan por la raíz: cortarla es mucho más
+        # barato que os.path.relpath con cientos de miles de archivos
+        prefix = len(os.path.join(self.source_root, ""))
+        for path, stat in library_scan.iter_entries([self.source_root], extensions,
+                                                    on_error=plan.unreadable.append):
+            relative = path[prefix:]
+            seen.add(relative)
+            record = self.files.get(relative)
+            if record is None:
+                output = self._output_for(relative, taken)
+                taken.add(output)
+            else:
+                output = record["output"]
+                if (record["state"] == "done" and record["size"] == stat.st_size
+                        and record["mtime_ns"] == stat.st_mtime_ns and output in existing):
+                    plan.unchanged += 1
+                    continue
+            plan.convert.append((relative, path, stat, output))
+
+        # Un origen desaparecido solo cuenta si su carpeta se leyó sin errores;
+        # con el origen vacío (p. ej. un disco sin montar) no se borra nada
+        unreadable = [os.path.relpath(folder, self.source_root) for folder in plan.unreadable]
+        if seen:
+            plan.orphans = [relative for relative in self.files
+                            if relative not in seen and not _inside_any(relative, unreadable)]
+        return plan
+
+    def _existing_outputs(self):
+        # Salidas presentes en disco; os.walk no necesita un stat por archivo
+        existing = set()
+        prefix = len(os.path.join(self.output_folder, ""))
+        for folder, _, names in os.walk(self.output_folder):
+            base = os.path.join(folder[prefix:], "") if len(folder) > prefix else ""
+            existing.update(base + name for name in names)
+        return existing
+
+    def _output_for(self, relative, taken):
+        # Misma ruta que el origen con extensión .mp4; si dos orígenes de la
+        # misma carpeta solo difieren en la extensión, el segundo la conserva
+        stem, extension = os.path.splitext(relative)
+        output = stem + ".mp4"
+        if output in taken:
+            output = f"{stem}.{extension.lstrip('.')}.mp4"
+        return output
+
+    # ----- ACTUALIZACIÓN -----
+    def output_path(self, output):
+        return os.path.join(self.output_folder, output)
+
+    def record(self, relative, stat, output, success):
+        self.files[relative] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "output": output,
+            "state": "done" if success else "failed",
+        }
+
+    def remove(self, relative):
+        # Borrar la salida de un origen eliminado y las carpetas que queden vacías
+        record = self.files.pop(relative)
+        path = self.output_path(record["output"])
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        folder = os.path.dirname(path)
+        while folder != self.output_folder and folder.startswith(self.output_folder):
+            try:
+                os.rmdir(folder)
+            except OSError:
+                break
+            folder = os.path.dirname(folder)
+        return record["output"]
+
+
+def _inside_any(relative, folders):
+    return any(folder == "." or relative.startswith(folder + os.sep) for folder in folders)
+
+
+async def sync(engine, index, plan, job_options=None, on_log=None, on_finished=None):
+    """Borra los huérfanos y convierte los cambios del plan, actualizando el índice"""
+    job_options = job_options or {}
+    for relative in plan.orphans:
+        output = index.remove(relative)
+        if on_log:
+            on_log(f"Salida borrada: {output}")
+
+    last_save = [time.monotonic()]
+
+    def finished(job, relative, stat, output):
+        index.record(relative, stat, output, job.success)
+        if on_finished:
+            on_finished(job)
+        if time.monotonic() - last_save[0] > SAVE_INTERVAL:
+            index.save()
+            last_save[0] = time.monotonic()
+
+    jobs = []
+    for relative, path, stat, output in plan.convert:
+        output_file = index.output_path(output)
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        jobs.append(ConversionJob(
+            path, output_file,
+            on_log=(lambda message, name=relative: on_log(f"[{name}] {message}")) if on_log else None,
+            on_finished=lambda job, args=(relative, stat, output): finished(job, *args),
+            **job_options
+        ))
+    try:
+        await engine.run_all(jobs)
+    finally:
+        index.save()
+    return jobs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mantiene una copia en MP4 de una biblioteca de audio")
+    parser.add_argument("source", help="Carpeta de origen con los archivos de audio")
+    parser.add_argument("-o", "--output-folder", default=DEFAULT_OUTPUT_FOLDER)
+    parser.add_argument("-j", "--jobs", type=int, default=max(1, (os.cpu_count() or 4) // 2),
+                        help="Número de conversiones simultáneas")
+    parser.add_argument("--extensions", default=",".join(library_scan.AUDIO_EXTENSIONS),
+                        help="Extensiones de origen separadas por comas")
+    parser.add_argument("--preset", default="ultrafast")
+    parser.add_argument("--no-hwaccel", action="store_true")
+    parser.add_argument("--visualizer", action="store_true",
+                        help="Vídeo con la forma de onda en lugar de fondo negro")
+    parser.add_argument("--normalize", type=float, nargs="?", const=loudness.DEFAULT_TARGET, metavar="LUFS",
+                        help=f"Normalizar la sonoridad (por defecto a {loudness.DEFAULT_TARGET:g} LUFS)")
+    parser.add_argument("--trim-silence", action="store_true",
+                        help="Recortar el silencio del principio y del final")
+    parser.add_argument("--keep-orphans", action="store_true",
+                        help="No borrar las salidas cuyo archivo de origen ya no existe")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Mostrar los cambios sin convertir ni borrar nada")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.source):
+        parser.error(f"no existe la carpeta de origen {args.source}")
+
+    index = MirrorIndex(args.source, args.output_folder).load()
+    plan = index.plan(args.extensions.split(","))
+    if args.keep_orphans:
+        plan.orphans = []
+    for folder in plan.unreadable:
+        print(f"No se pudo leer {folder}; sus salidas se conservan", file=sys.stderr)
+    print(f"{len(plan.convert)} por convertir, {len(plan.orphans)} salidas por borrar, "
+          f"{plan.unchanged} sin cambios", file=sys.stderr)
+
+    if args.dry_run:
+        for relative, _, _, output in plan.convert:
+            print(f"CONVERTIR\t{relative}\t{output}")
+        for relative in plan.orphans:
+            print(f"BORRAR\t{index.files[relative]['output']}")
+        return 0
+    if not plan.convert and not plan.orphans:
+        return 0
+
+    engine = ConversionEngine(max_concurrent=args.jobs)
+    history_file = conversion_history.history_path(args.output_folder)
+    engine.speed_model = SpeedModel.from_history(conversion_history.read_history(history_file))
+
+    def on_finished(job):
+        print(f"{'OK' if job.success else 'ERROR'}\t{job.input_file}\t{job.message}")
+
+    jobs = asyncio.run(sync(
+        engine, index, plan,
+        job_options={"preset": args.preset, "use_hwaccel": not args.no_hwaccel,
+                     "visualizer": args.visualizer, "loudness_target": args.normalize,
+                     "trim_silence": args.trim_silence},
+        on_log=lambda message: print(message, file=sys.stderr),
+        on_finished=on_finished
+    ))
+    # Las conversiones del espejo también mejoran las estimaciones de tiempo
+    if jobs:
+        conversion_history.append_entries(history_file, [conversion_history.entry_for_job(job) for job in jobs])
+    return 0 if all(job.success for job in jobs) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
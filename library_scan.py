@@ -0,0 +1,88 @@
+"""Exploración recursiva de carpetas para importar bibliotecas de audio.
+
+Recorre el árbol con os.scandir, que en la mayoría de sistemas devuelve el
+tipo de cada entrada sin una llamada a stat por archivo, y entrega los
+archivos encontrados por lotes para que la cola empiece a convertir antes de
+que termine la exploración de una biblioteca de cientos de miles de archivos.
+"""
+import os
+import time
+
+AUDIO_EXTENSIONS = ("m4a", "mp3", "wav", "flac", "ogg", "aac", "wma")
+
+# Un lote se entrega al llegar a este tamaño o al pasar este tiempo desde el
+# anterior, lo que ocurra antes: los primeros archivos llegan enseguida
+BATCH_SIZE = 500
+BATCH_INTERVAL = 0.2
+
+
+def normalize_extensions(extensions):
+    # "MP3", ".mp3" y "mp3" valen igual
+    return {"." + extension.lower().lstrip(".") for extension in extensions}
+
+
+def iter_entries(roots, extensions=AUDIO_EXTENSIONS, should_stop=None, on_error=None):
+    """Genera (ruta, os.stat_result) de los archivos con las extensiones indicadas.
+
+    roots puede mezclar carpetas y archivos sueltos. No sigue enlaces
+    simbólicos a carpetas, para no entrar en ciclos; should_stop es una función
+    que se consulta en cada carpeta para abandonar la exploración y on_error
+    recibe la ruta de cada carpeta que no se pudo leer.
+    """
+    suffixes = normalize_extensions(extensions)
+    pending = []
+    for root in roots:
+        if os.path.isdir(root):
+            pending.append(root)
+        elif os.path.splitext(root)[1].lower() in suffixes:
+            try:
+                yield root, os.stat(root)
+            except OSError:
+                continue
+
+    # Pila en lugar de recursión: los árboles profundos no agotan la pila de Python
+    pending.reverse()
+    while pending:
+        if should_stop and should_stop():
+            return
+        folder = pending.pop()
+        try:
+            with os.scandir(folder) as entries:
+                entries = sorted(entries, key=lambda entry: entry.name)
+        except OSError:
+            if on_error:
+                on_error(folder)
+            continue
+        subfolders = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subfolders.append(entry.path)
+                elif os.path.splitext(entry.name)[1].lower() in suffixes and entry.is_file():
+                    yield entry.path, entry.stat()
+            except OSError:
+                continue
+        # Recorrer las subcarpetas en orden alfabético
+        pending.extend(reversed(subfolders))
+
+
+def iter_files(roots, extensions=AUDIO_EXTENSIONS, should_stop=None):
+    # Solo la ruta y el tamaño de cada archivo
+    for path, stat in iter_entries(roots, extensions, should_stop):
+        yield path, stat.st_size
+
+
+def iter_batches(roots, extensions=AUDIO_EXTENSIONS, should_stop=None,
+                 batch_size=BATCH_SIZE, interval=BATCH_INTERVAL):
+    # Agrupar los archivos encontrados en listas de (ruta, tamaño)
+    batch = []
+    last = time.monotonic()
+    for item in iter_files(roots, extensions, should_stop):
+        batch.append(item)
+        now = time.monotonic()
+        if len(batch) >= batch_size or now - last >= interval:
+            yield batch
+            batch = []
+            last = now
+    if batch:
+        yield batch
@@ -0,0 +1,78 @@
+"""Normalización de sonoridad (EBU R128) con medidas en caché.
+
+La normalización en dos pasadas de loudnorm decodifica cada entrada dos veces.
+Aquí la medida se aprovecha de la propia conversión: la primera vez que se
+convierte un archivo se normaliza con loudnorm en una sola pasada, que al
+terminar informa de la sonoridad medida de la entrada, y esa medida se guarda
+en caché. Las conversiones siguientes del mismo archivo, con cualquier salida
+o preset, aplican directamente una ganancia lineal (volume), sin medir.
+"""
+import os
+import re
+import math
+import tempfile
+
+from file_cache import FileCache
+
+DEFAULT_CACHE_FILE = os.path.join(tempfile.gettempdir(), "AudioConverterPro_Loudness.json")
+
+# Objetivo por defecto: -16 LUFS (habitual en plataformas de streaming); -23 es
+# el de EBU R128 para emisión
+DEFAULT_TARGET = -16.0
+TRUE_PEAK_LIMIT = -1.0
+LOUDNESS_RANGE = 11
+
+# loudnorm trabaja a 192 kHz; la salida vuelve a una frecuencia habitual
+OUTPUT_SAMPLE_RATE = 48000
+
+# Audio normalizado: hay que recodificarlo (AAC a 192 kbit/s)
+OUTPUT_BITRATE = 192000
+
+# Líneas del informe JSON que loudnorm escribe en stderr al terminar
+_MEASUREMENT_RE = re.compile(r'"input_(i|tp|lra|thresh)"\s*:\s*"([^"]*)"')
+
+
+def measuring_filter(target):
+    # Primera conversión: normalizar en una pasada e informar de la medida
+    return (f"loudnorm=I={target}:TP={TRUE_PEAK_LIMIT}:LRA={LOUDNESS_RANGE}:print_format=json,"
+            f"aresample={OUTPUT_SAMPLE_RATE}")
+
+
+def linear_gain(measurement, target):
+    # Ganancia en dB hasta el objetivo, sin que el pico real pase del límite
+    integrated = measurement.get("i")
+    if integrated is None:
+        # Entrada en silencio: no hay nada que normalizar
+        return 0.0
+    gain = target - integrated
+    true_peak = measurement.get("tp")
+    if true_peak is not None:
+        gain = min(gain, TRUE_PEAK_LIMIT - true_peak)
+    return gain
+
+
+def linear_filter(measurement, target):
+    return f"volume={linear_gain(measurement, target):.2f}dB"
+
+
+def parse_line(line, values):
+    # Acumular en values los campos de la medida que aparezcan en la línea
+    match = _MEASUREMENT_RE.search(line)
+    if match:
+        try:
+            value = float(match.group(2))
+        except ValueError:
+            return
+        values[match.group(1)] = value if math.isfinite(value) else None
+
+
+class LoudnessCache(FileCache):
+    """Medidas de sonoridad por archivo, guardadas en un JSON"""
+
+    def __init__(self, path=DEFAULT_CACHE_FILE):
+        super().__init__(path)
+
+    def put(self, input_file, measurement):
+        # Una medida incompleta (conversión interrumpida) no se guarda
+        if "i" in measurement:
+            super().put(input_file, measurement)
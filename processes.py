@@ -0,0 +1,72 @@
+"""Procesos auxiliares de FFmpeg y FFprobe que no deben sobrevivir a su tarea.
+
+Los análisis previos (duración, silencio, forma de onda, verificación) lanzan
+procesos cortos y esperan su salida. Si la tarea se cancela mientras tanto,
+asyncio no detiene el proceso: seguiría en marcha sin que nadie lo recoja y,
+al cerrar el bucle de eventos, su transporte fallaría con "Event loop is
+closed". communicate() lo mata y lo recoge antes de propagar la cancelación.
+"""
+import asyncio
+
+# Espera máxima a que termine un proceso ya matado; uno bloqueado en el
+# kernel (p. ej. en una unidad de red caída) no debe retener la cancelación
+KILL_TIMEOUT = 5
+
+# Cada cuánto se comprueba si un proceso auxiliar sigue trabajando
+PROGRESS_INTERVAL = 0.5
+
+
+async def communicate(process, input=None, on_progress=None):
+    """Como process.communicate(), pero mata el proceso si se cancela la espera.
+
+    Con on_progress, mientras el proceso consuma CPU se llama a on_progress()
+    cada PROGRESS_INTERVAL segundos: muchas pasadas de FFmpeg (p. ej. la forma
+    de onda) no escriben nada hasta terminar, y un proceso colgado en una
+    unidad de red no consume CPU. Solo en Linux; en otros sistemas no avisa.
+    """
+    watcher = asyncio.ensure_future(_watch_cpu(process, on_progress)) if on_progress else None
+    try:
+        return await process.communicate(input)
+    except asyncio.CancelledError:
+        await kill(process)
+        raise
+    finally:
+        if watcher:
+            watcher.cancel()
+
+
+def cpu_time(pid):
+    # Tics de CPU (usuario + sistema) consumidos por el proceso, o None
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return int(fields[11]) + int(fields[12])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+async def _watch_cpu(process, on_progress):
+    last = cpu_time(process.pid)
+    if last is None:
+        return
+    while process.returncode is None:
+        await asyncio.sleep(PROGRESS_INTERVAL)
+        current = cpu_time(process.pid)
+        if current is None:
+            return
+        if current > last:
+            on_progress()
+        last = current
+
+
+async def kill(process, timeout=KILL_TIMEOUT):
+    # Matar el proceso si sigue vivo y esperar a que termine como mucho timeout segundos
+    if process.returncode is None:
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+    try:
+        await asyncio.wait_for(process.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
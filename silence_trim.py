@@ -0,0 +1,154 @@
+"""Recorte automático del silencio al principio y al final de las grabaciones.
+
+Una pasada previa barata localiza los bordes: solo se decodifican los primeros
+y los últimos segundos de la entrada, a 8 kHz y en mono, con silencedetect. Si
+el silencio llega al borde de lo analizado, la ventana de ese extremo se
+duplica hasta encontrar el sonido o analizar el archivo entero. Los
+límites se guardan en caché junto con la duración que devuelve ffprobe, y la
+conversión los recibe como opciones de entrada (-ss y -t): FFmpeg ni siquiera
+lee el silencio recortado, así que se ahorra tiempo de codificación y espacio
+en la salida.
+"""
+import os
+import re
+import asyncio
+import tempfile
+
+import processes
+from file_cache import FileCache
+
+DEFAULT_CACHE_FILE = os.path.join(tempfile.gettempdir(), "AudioConverterPro_Trim.json")
+
+# Silencio: por debajo de -50 dB durante al menos 1 segundo
+SILENCE_THRESHOLD = "-50dB"
+MIN_SILENCE = 1.0
+
+# Segundos analizados al principio y al final en la primera pasada; un
+# archivo más corto que una ventana se analiza entero en una sola pasada
+SCAN_WINDOW = 45
+
+# Versión del análisis guardada en caché: los límites calculados por versiones
+# anteriores (que no ampliaban la ventana) se vuelven a calcular
+CACHE_VERSION = 2
+
+# Silencio que se conserva junto al sonido para no cortar ataques ni colas
+PADDING = 0.25
+
+# Margen para considerar que un silencio llega al borde de lo analizado
+EDGE_TOLERANCE = 0.1
+
+# Baja resolución: basta con la envolvente para encontrar los bordes
+SCAN_FILTER = f"aresample=8000,aformat=channel_layouts=mono,silencedetect=noise={SILENCE_THRESHOLD}:d={MIN_SILENCE}"
+
+_START_RE = re.compile(r"silence_start: (-?[\d.]+)")
+_END_RE = re.compile(r"silence_end: (-?[\d.]+)")
+
+
+def parse_silences(text):
+    # Intervalos [inicio, fin] en el orden en que silencedetect los informa
+    silences = []
+    for line in text.splitlines():
+        start = _START_RE.search(line)
+        if start:
+            silences.append([float(start.group(1)), None])
+            continue
+        end = _END_RE.search(line)
+        if end and silences and silences[-1][1] is None:
+            silences[-1][1] = float(end.group(1))
+    return silences
+
+
+def leading_silence(silences, window):
+    # Fin del silencio que empieza con la ventana (0 si no hay)
+    if silences and silences[0][0] <= EDGE_TOLERANCE:
+        return silences[0][1] if silences[0][1] is not None else window
+    return 0.0
+
+
+def trailing_silence(silences, window):
+    # Inicio del silencio que llega hasta el final de la ventana (None si no hay)
+    if silences:
+        start, end = silences[-1]
+        if end is None or end >= window - EDGE_TOLERANCE:
+            return start
+    return None
+
+
+async def detect_silences(ffmpeg, path, input_options=(), seek=None, length=None, on_progress=None):
+    # Intervalos de silencio en [seek, seek + length), relativos a seek
+    cmd = [ffmpeg, '-hide_banner', '-nostats', *input_options]
+    if seek:
+        cmd.extend(['-ss', f"{seek:.3f}"])
+    if length:
+        cmd.extend(['-t', f"{length:.3f}"])
+    cmd.extend(['-i', path, '-map', '0:a:0', '-af', SCAN_FILTER, '-f', 'null', '-'])
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+    _, stderr = await processes.communicate(process, on_progress=on_progress)
+    if process.returncode != 0:
+        raise RuntimeError(f"No se pudo analizar el silencio (código {process.returncode})")
+    return parse_silences(stderr.decode(errors="replace"))
+
+
+async def find_boundaries(ffmpeg, path, duration, input_options=(), window=SCAN_WINDOW, on_progress=None):
+    """Devuelve (inicio, fin) en segundos del audio sin el silencio de los bordes.
+
+    on_progress se llama periódicamente mientras se analiza.
+    """
+    start = await _head_boundary(ffmpeg, path, duration, input_options, window, on_progress)
+    end = None
+    if start is not None:
+        end = await _tail_boundary(ffmpeg, path, duration, input_options, window, on_progress)
+    if start is None or end is None:
+        # Archivo corto, o silencio que no cabe en ninguna ventana: una pasada completa
+        silences = await detect_silences(ffmpeg, path, input_options, on_progress=on_progress)
+        if len(silences) == 1 and leading_silence(silences, duration) >= duration - EDGE_TOLERANCE:
+            # Todo es silencio: no se recorta nada
+            return 0.0, duration
+        start = leading_silence(silences, duration)
+        end = trailing_silence(silences, duration)
+        if end is None:
+            end = duration
+
+    start = max(0.0, start - PADDING) if start else 0.0
+    end = min(duration, end + PADDING)
+    if end <= start:
+        return 0.0, duration
+    return start, end
+
+
+async def _head_boundary(ffmpeg, path, duration, input_options, window, on_progress):
+    # Fin del silencio inicial, ampliando la ventana mientras el silencio
+    # llegue a su borde; None si haría falta analizar el archivo entero
+    while window < duration:
+        silences = await detect_silences(ffmpeg, path, input_options, length=window, on_progress=on_progress)
+        start = leading_silence(silences, window)
+        if start < window - EDGE_TOLERANCE:
+            return start
+        window *= 2
+    return None
+
+
+async def _tail_boundary(ffmpeg, path, duration, input_options, window, on_progress):
+    # Inicio del silencio final (o la duración si no lo hay), igual que _head_boundary
+    while window < duration:
+        offset = duration - window
+        silences = await detect_silences(ffmpeg, path, input_options, seek=offset, on_progress=on_progress)
+        start = trailing_silence(silences, window)
+        if start is None:
+            return duration
+        if start > EDGE_TOLERANCE:
+            return offset + start
+        window *= 2
+    return None
+
+
+class ProbeCache(FileCache):
+    """Duración y límites sin silencio de cada entrada, guardados en un JSON"""
+
+    def __init__(self, path=DEFAULT_CACHE_FILE):
+        super().__init__(path)
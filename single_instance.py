@@ -0,0 +1,72 @@
+"""Instancia única de la interfaz gráfica.
+
+La primera ventana escucha en un socket local (QLocalServer). Cuando la
+aplicación se abre otra vez, por ejemplo desde el explorador de archivos, el
+nuevo proceso envía sus archivos a la ventana ya abierta y termina sin llegar
+a importar PyQt5. Así todas las conversiones comparten la misma cola y el
+mismo motor.
+
+Este módulo solo usa la biblioteca estándar: se importa antes que PyQt5.
+"""
+import os
+import sys
+import json
+import socket
+import getpass
+import tempfile
+
+CONNECT_TIMEOUT = 0.5
+
+
+def server_name():
+    # Un servidor por usuario
+    try:
+        user = getpass.getuser()
+    except Exception:
+        user = "default"
+    return f"AudioConverterPro-{user}"
+
+
+def listen_name():
+    # Nombre para QLocalServer.listen: en Unix una ruta completa de socket para
+    # que el cliente de la biblioteca estándar sepa dónde conectarse
+    if sys.platform == "win32":
+        return server_name()
+    return os.path.join(tempfile.gettempdir(), server_name())
+
+
+def encode_message(files):
+    return (json.dumps({"files": [os.path.abspath(path) for path in files]}) + "\n").encode()
+
+
+def decode_message(data):
+    # Archivos de todos los mensajes recibidos; se ignoran las líneas no válidas
+    files = []
+    for line in data.decode(errors="replace").splitlines():
+        try:
+            files.extend(json.loads(line).get("files", []))
+        except (ValueError, AttributeError):
+            continue
+    return files
+
+
+def forward_to_running_instance(files):
+    """Envía los archivos a la ventana abierta; devuelve False si no hay ninguna"""
+    message = encode_message(files)
+    if sys.platform == "win32":
+        # QLocalServer usa tuberías con nombre en Windows
+        try:
+            with open("\\\\.\\pipe\\" + server_name(), "wb") as pipe:
+                pipe.write(message)
+            return True
+        except OSError:
+            return False
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(CONNECT_TIMEOUT)
+            client.connect(listen_name())
+            client.sendall(message)
+        return True
+    except OSError:
+        return False
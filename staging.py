@@ -0,0 +1,184 @@
+"""Preparación de entradas y salidas en un disco local rápido.
+
+Cuando las entradas o la carpeta de salida están en una unidad de red, FFmpeg
+espera a la latencia de la red en cada escritura pequeña y al finalizar el
+MP4. Con una zona de preparación (staging) las entradas se copian por
+adelantado a una carpeta local (o tmpfs), FFmpeg trabaja solo en local y la
+salida terminada se copia a su destino de una sola vez, en secuencia.
+"""
+import os
+import shutil
+import asyncio
+import threading
+import concurrent.futures
+
+import loudness
+
+# Margen para el MP4 generado: el audio se copia y el vídeo negro ocupa poco
+OUTPUT_OVERHEAD_RATIO = 1.1
+OUTPUT_OVERHEAD_BYTES = 16 * 1024 * 1024
+
+# Con la sonoridad normalizada el audio se recodifica a loudness.OUTPUT_BITRATE
+# y puede ocupar más que la entrada. Sin duración conocida se estima desde el
+# tamaño suponiendo una entrada de 32 kbit/s, el peor caso habitual
+MIN_INPUT_BITRATE = 32000
+
+# Espacio libre que nunca se debe ocupar en el disco local
+DEFAULT_RESERVE_BYTES = 512 * 1024 * 1024
+
+# Las copias avanzan por bloques de 4 MiB y avisan tras cada uno
+COPY_CHUNK_BYTES = 4 * 1024 * 1024
+
+
+class StagingArea:
+    """Zona local de preparación con lectura anticipada limitada y control de espacio"""
+
+    def __init__(self, scratch_dir, max_bytes=None, read_ahead=2, reserve_bytes=DEFAULT_RESERVE_BYTES):
+        self.scratch_dir = scratch_dir
+        self.max_bytes = max_bytes
+        self.read_ahead = read_ahead
+        self.reserve_bytes = reserve_bytes
+        os.makedirs(scratch_dir, exist_ok=True)
+
+        # Las copias son lecturas secuenciales grandes: pocas a la vez
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="staging")
+        # Las reservas se deciden en los hilos de copia, no en el bucle de eventos
+        self._lock = threading.Lock()
+        self._reserved = {}
+        self._prefetches = {}
+        # Avisos de avance de la copia de cada trabajo (los registra stage)
+        self._observers = {}
+
+    # ----- CONTROL DE ESPACIO -----
+    def _needed_bytes(self, job):
+        try:
+            size = os.path.getsize(job.input_file)
+        except OSError:
+            return None
+        output_size = int(size * OUTPUT_OVERHEAD_RATIO)
+        if job.loudness_target is not None:
+            duration = job.duration or size * 8 / MIN_INPUT_BITRATE
+            output_size = max(output_size, int(duration * loudness.OUTPUT_BITRATE / 8))
+        return size + len(job.targets) * (output_size + OUTPUT_OVERHEAD_BYTES)
+
+    def _reserve(self, job):
+        # Reservar espacio para la entrada y la salida; False si no cabe ahora
+        with self._lock:
+            if job.id in self._reserved:
+                return True
+            needed = self._needed_bytes(job)
+            if needed is None:
+                return False
+            in_use = sum(self._reserved.values())
+            if self.max_bytes is not None and in_use + needed > self.max_bytes:
+                return False
+            # El espacio reservado aún no está escrito del todo en disco
+            free = shutil.disk_usage(self.scratch_dir).free
+            if free - self.reserve_bytes - in_use < needed:
+                return False
+            self._reserved[job.id] = needed
+            return True
+
+    def _job_dir(self, job):
+        return os.path.join(self.scratch_dir, f"job_{os.getpid()}_{job.id}")
+
+    # ----- ENTRADAS -----
+    def prefetch(self, job):
+        # Empezar a copiar la entrada en segundo plano; el tamaño y el espacio
+        # libre se consultan en el hilo de la copia, que devuelve None si no cabe
+        prefetch = self._prefetches.get(job.id)
+        if prefetch is not None and not _without_space(prefetch):
+            return
+        local_input = os.path.join(self._job_dir(job), os.path.basename(job.input_file))
+        loop = asyncio.get_running_loop()
+        self._prefetches[job.id] = loop.run_in_executor(self._executor, self._copy_input,
+                                                        job, local_input)
+
+    def _copy_input(self, job, local_input):
+        if not self._reserve(job):
+            return None
+        os.makedirs(os.path.dirname(local_input), exist_ok=True)
+        _copy_file(job.input_file, local_input, lambda: self._notify(job.id))
+        return local_input
+
+    def _notify(self, job_id):
+        on_progress = self._observers.get(job_id)
+        if on_progress:
+            on_progress()
+
+    async def stage(self, job, on_progress=None):
+        """Prepara las rutas locales del trabajo; si no cabe, trabaja en remoto.
+
+        on_progress se llama desde el hilo de la copia tras cada bloque copiado.
+        """
+        self.prefetch(job)
+        if on_progress:
+            self._observers[job.id] = on_progress
+        try:
+            job.read_path = await self._prefetches[job.id]
+        except OSError:
+            self.discard(job)
+            return False
+        finally:
+            self._observers.pop(job.id, None)
+        if job.read_path is None:
+            self._prefetches.pop(job.id, None)
+            return False
+        for index, target in enumerate(job.targets):
+            target.write_path = os.path.join(self._job_dir(job), f"{index}_{os.path.basename(target.output_file)}")
+        return True
+
+    # ----- SALIDAS -----
+    async def finalize(self, job, on_progress=None):
+        # Copiar cada salida local correcta a su destino en una sola copia secuencial
+        loop = asyncio.get_running_loop()
+        for target in job.targets:
+            if target.write_path and target.success:
+                await loop.run_in_executor(self._executor, self._move_output,
+                                           target.write_path, target.output_file, on_progress)
+
+    def _move_output(self, local_output, destination, on_progress=None):
+        os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+        partial = destination + ".part"
+        _copy_file(local_output, partial, on_progress)
+        # El destino solo aparece cuando está completo
+        os.replace(partial, destination)
+        os.remove(local_output)
+
+    def discard(self, job):
+        # Liberar el espacio y borrar los archivos locales del trabajo
+        prefetch = self._prefetches.pop(job.id, None)
+        job_dir = self._job_dir(job)
+        if prefetch is not None and not prefetch.done():
+            # La copia sigue en curso (y puede reservar aún): limpiar cuando termine
+            prefetch.add_done_callback(lambda _: self._release(job.id, job_dir))
+        else:
+            self._release(job.id, job_dir)
+        job.read_path = None
+        for target in job.targets:
+            target.write_path = None
+
+    def _release(self, job_id, job_dir):
+        with self._lock:
+            self._reserved.pop(job_id, None)
+        shutil.rmtree(job_dir, ignore_errors=True)
+
+
+def _copy_file(source, destination, on_progress=None):
+    # Copia por bloques para poder avisar del avance en copias largas
+    if on_progress is None:
+        shutil.copyfile(source, destination)
+        return
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        while True:
+            chunk = src.read(COPY_CHUNK_BYTES)
+            if not chunk:
+                break
+            dst.write(chunk)
+            on_progress()
+
+
+def _without_space(prefetch):
+    # Lectura anticipada terminada sin copiar porque no había espacio
+    return prefetch.done() and not prefetch.cancelled() and prefetch.exception() is None \
+        and prefetch.result() is None
@@ -0,0 +1,98 @@
+"""Verificación rápida de las salidas tras la conversión.
+
+Un código de salida 0 de FFmpeg no garantiza que el MP4 sea válido (disco
+lleno, unidad de red caída, entrada truncada...). Decodificar la salida
+completa duplicaría el coste, así que solo se leen los metadatos del
+contenedor con ffprobe: qué flujos tiene y cuánto duran según el índice del
+MP4. La verificación tiene su propio límite de procesos para no ocupar los
+huecos de conversión del motor.
+"""
+import os
+import json
+import asyncio
+
+import processes
+
+DEFAULT_WORKERS = 2
+
+# Diferencia de duración admitida frente a la entrada: el mayor de los dos
+DURATION_TOLERANCE_SECONDS = 1.0
+DURATION_TOLERANCE_RATIO = 0.02
+
+
+class OutputVerifier:
+    """Comprueba los flujos y la duración de las salidas de un trabajo"""
+
+    def __init__(self, ffprobe="ffprobe", workers=DEFAULT_WORKERS):
+        self.ffprobe = ffprobe
+        self.workers = workers
+        self._slots = None
+
+    async def probe(self, path):
+        # Solo metadatos del contenedor y de los flujos, sin decodificar
+        process = await asyncio.create_subprocess_exec(
+            self.ffprobe, '-v', 'error',
+            '-show_entries', 'stream=codec_type,duration:format=duration',
+            '-of', 'json', path,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        stdout, _ = await processes.communicate(process)
+        if process.returncode != 0:
+            return None
+        try:
+            return json.loads(stdout or b"{}")
+        except ValueError:
+            return None
+
+    async def verify(self, job):
+        """Devuelve (correcto, mensaje) tras revisar todas las salidas en disco.
+
+        correcto es None si no se pudo verificar porque falta ffprobe.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        async with self._slots:
+            for target in job.targets:
+                if not target.success:
+                    continue
+                try:
+                    info = await self.probe(target.output_file)
+                except FileNotFoundError:
+                    return None, f"no se encontró {self.ffprobe}"
+                problem = check_output(info, job.duration, expect_video=not target.audio_only)
+                if problem:
+                    target.success = False
+                    return False, f"{os.path.basename(target.output_file)}: {problem}"
+        return True, ""
+
+
+def _duration(entry):
+    try:
+        return float(entry.get("duration"))
+    except (TypeError, ValueError):
+        return None
+
+
+def check_output(info, expected_duration, expect_video=True):
+    # Devuelve la descripción del problema, o None si la salida es correcta
+    if info is None:
+        return "no se pudo leer el contenedor"
+    streams = info.get("streams", [])
+    audio = [stream for stream in streams if stream.get("codec_type") == "audio"]
+    video = [stream for stream in streams if stream.get("codec_type") == "video"]
+    if not audio:
+        return "no tiene flujo de audio"
+    if expect_video and not video:
+        return "no tiene flujo de vídeo"
+
+    if expected_duration:
+        tolerance = max(DURATION_TOLERANCE_SECONDS, expected_duration * DURATION_TOLERANCE_RATIO)
+        # La duración del audio es la referencia; si falta, la del contenedor
+        duration = _duration(audio[0]) or _duration(info.get("format", {}))
+        if duration is None:
+            return "duración desconocida"
+        if abs(duration - expected_duration) > tolerance:
+            return f"dura {duration:.1f}s y la entrada {expected_duration:.1f}s"
+    return None
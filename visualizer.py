@@ -0,0 +1,151 @@
+"""Vídeo de visualización de la forma de onda con un coste de CPU acotado.
+
+Generar showwaves o showspectrum a 30 fps obliga a decodificar el audio y
+dibujar cada fotograma, lo que multiplica el tiempo de cada conversión. En su
+lugar:
+
+1. El fondo estático se genera una vez por resolución y se guarda en caché.
+2. La forma de onda completa se calcula en una sola pasada de decodificación
+   (showwavespic), se compone sobre el fondo y se guarda en caché por archivo.
+3. La conversión solo repite esa imagen a pocos fotogramas por segundo y
+   dibuja encima un cursor de reproducción (overlay), muy barato de codificar.
+"""
+import os
+import math
+import asyncio
+import hashlib
+import tempfile
+
+import processes
+
+DEFAULT_CACHE_FOLDER = os.path.join(tempfile.gettempdir(), "AudioConverterPro_Waveforms")
+
+# Presupuesto por defecto: 5 fotogramas por segundo en lugar de 30
+DEFAULT_FPS = 5
+
+BACKGROUND_COLOR = "0x101820"
+WAVE_COLOR = "0x4FC3F7"
+PLAYHEAD_COLOR = "white"
+PLAYHEAD_WIDTH = 3
+
+# Parte de la altura ocupada por la forma de onda
+WAVE_HEIGHT_RATIO = 0.6
+
+
+class WaveformCache:
+    """Caché en disco de fondos y fotogramas de forma de onda ya compuestos"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_FOLDER, ffmpeg="ffmpeg"):
+        self.cache_dir = cache_dir
+        self.ffmpeg = ffmpeg
+        # Generaciones en curso: dos trabajos con la misma entrada comparten una
+        self._pending = {}
+        # Trabajos que esperan cada imagen en curso y quieren saber que avanza
+        self._listeners = {}
+
+    def _path(self, name):
+        return os.path.join(self.cache_dir, name)
+
+    def _input_key(self, input_file, width, height, input_options=()):
+        # La caché se invalida si el archivo cambia de tamaño o de fecha; las
+        # opciones de entrada (p. ej. el recorte del silencio) cambian la imagen
+        stat = os.stat(input_file)
+        key = f"{os.path.abspath(input_file)}|{stat.st_size}|{stat.st_mtime_ns}|{width}x{height}"
+        if input_options:
+            key += "|" + " ".join(input_options)
+        return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+    async def background(self, width, height):
+        # Capa de fondo estática, común a todos los archivos con esta resolución
+        path = self._path(f"background_{width}x{height}.png")
+        graph = (f"color=c={BACKGROUND_COLOR}:s={width}x{height},"
+                 f"drawgrid=w={width // 16}:h={height // 8}:t=1:c=white@0.06")
+        return await self._generate(path, ['-f', 'lavfi', '-i', graph, '-frames:v', '1'])
+
+    async def frame(self, input_file, width, height, input_options=(), read_path=None, on_progress=None):
+        """Devuelve la ruta del fotograma con la forma de onda de input_file.
+
+        read_path permite leer una copia local (zona de preparación) sin
+        cambiar la clave de la caché, que depende del archivo original;
+        on_progress se llama periódicamente mientras FFmpeg decodifica.
+        """
+        background = await self.background(width, height)
+        # os.stat de la entrada, que puede estar en una unidad de red lenta:
+        # fuera del bucle de eventos para no detener los demás trabajos
+        key = await asyncio.get_running_loop().run_in_executor(
+            None, self._input_key, input_file, width, height, input_options)
+        path = self._path(f"wave_{key}.png")
+        wave_height = int(height * WAVE_HEIGHT_RATIO)
+        graph = (f"[1:a]aformat=channel_layouts=mono,"
+                 f"showwavespic=s={width}x{wave_height}:colors={WAVE_COLOR}[wave];"
+                 f"[0:v][wave]overlay=0:(H-h)/2")
+        return await self._generate(path, ['-i', background, *input_options, '-i', read_path or input_file,
+                                           '-filter_complex', graph, '-frames:v', '1'], on_progress)
+
+    async def _generate(self, path, args, on_progress=None):
+        if os.path.exists(path):
+            return path
+        task = self._pending.get(path)
+        if task is None:
+            task = self._pending[path] = asyncio.ensure_future(self._run(path, args))
+            task.add_done_callback(lambda _: self._pending.pop(path, None))
+        if on_progress is None:
+            return await asyncio.shield(task)
+        # Varios trabajos pueden esperar la misma imagen: todos reciben el avance
+        listeners = self._listeners.setdefault(path, [])
+        listeners.append(on_progress)
+        try:
+            return await asyncio.shield(task)
+        finally:
+            listeners.remove(on_progress)
+            if not listeners:
+                self._listeners.pop(path, None)
+
+    def _notify(self, path):
+        for on_progress in list(self._listeners.get(path, ())):
+            on_progress()
+
+    async def _run(self, path, args):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Escribir en un temporal para no dejar nunca una imagen a medias en caché
+        temp_path = f"{path}.{os.getpid()}.tmp.png"
+        process = await asyncio.create_subprocess_exec(
+            self.ffmpeg, '-y', '-v', 'error', *args, temp_path,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            _, stderr = await processes.communicate(process, on_progress=lambda: self._notify(path))
+        except asyncio.CancelledError:
+            _remove(temp_path)
+            raise
+        if process.returncode != 0:
+            _remove(temp_path)
+            raise RuntimeError(f"No se pudo generar la forma de onda: {stderr.decode(errors='replace').strip()}")
+        os.replace(temp_path, path)
+        return path
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def still_loop(duration, fps):
+    # Decodificar la imagen una sola vez y repetir el fotograma ya convertido
+    # durante toda la duración del audio
+    frames = max(1, math.ceil(duration * fps))
+    return f"format=yuv420p,loop=loop={frames - 1}:size=1,setpts=N/{fps}/TB,fps={fps}"
+
+
+def playhead_source(height, fps):
+    # Franja vertical que hace de cursor de reproducción
+    return f"color=c={PLAYHEAD_COLOR}:s={PLAYHEAD_WIDTH}x{height}:r={fps}"
+
+
+def playhead_overlay(duration):
+    # Desplazar el cursor por la imagen a lo largo de la duración del audio
+    return f"overlay=x='t/{duration:.3f}*(W-w)':y=0:eval=frame"